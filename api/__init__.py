@@ -6,18 +6,26 @@ from flask_restful import Api
 from flasgger import Swagger
 
 from api.db import db
+from api import migrations
+from api.utility import search_index
+from api.utility.pool import engine_options
+from api.utility import jobs
+from api.utility.uploads import StreamingRequest
 
 from api.resources.user import UserResource, UserListResource
 from api.resources.committee import CommitteeResource, CommitteeListResource, CommitteePostListWithCommitteeResource
 from api.resources.committee_post import CommitteePostResource, CommitteePostListResource
 from api.resources.document import DocumentResource, DocumentListResource, DocumentTagResource, DocumentTagListResource
 from api.resources.search import SearchResource
+from api.resources.autocomplete import AutocompleteResource
+from api.resources.jobs import JobResource
 from api.resources.post import PostResource, PostListResource
 from api.resources.post_tag import PostTagResource, PostTagAddResource, PostTagListResource
 from api.resources.page import PageResource, PageListResource
 from api.resources.officials import OfficialsResource
 from api.resources.operational_years import OperationalYearsResource
 from api.resources.health import HealthResource
+from api.resources.metrics import MetricsResource
 from api.resources.me import MeCommitteeResource
 from api.resources.test import TestResource
 from api.resources.album import AlbumListResource, AlbumResource
@@ -27,11 +35,17 @@ from api.resources.authentication import AuthenticationResource#, oidc
 from api.resources.event import EventResource, EventListResource
 
 import os
+import click
 import datetime
 
 app = Flask(__name__)
+app.request_class = StreamingRequest
 
 app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI', 'sqlite:///medieteknikdev.db')
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config['SQLALCHEMY_DATABASE_URI'])
+# En läsreplika som anonyma GET-anrop kan läsa från, se reads_from_replica i api/db.py
+if os.getenv('SQLALCHEMY_REPLICA_URI'):
+    app.config['SQLALCHEMY_BINDS'] = {'replica': os.getenv('SQLALCHEMY_REPLICA_URI')}
 app.config['SECRET_KEY'] = os.getenv("SECRET_KEY", "2kfueoVmpd0FBVFCJD0V")
 # app.config['OIDC_CLIENT_SECRETS'] = "./api/client_secrets.json"
 # app.config['OIDC_CALLBACK_ROUTE'] = "/oidc"
@@ -79,6 +93,7 @@ api.add_resource(DocumentTagListResource, "/document_tags")
 api.add_resource(DocumentTagResource, "/document_tags/<id>")
 
 api.add_resource(SearchResource, "/search/<search_term>")
+api.add_resource(AutocompleteResource, "/autocomplete")
 
 api.add_resource(PostListResource, "/posts")
 api.add_resource(PostResource, "/posts/<id>")
@@ -104,6 +119,9 @@ api.add_resource(VideoListResource, "/video")
 api.add_resource(VideoUploadTestResource, "/video_upload")
 
 api.add_resource(HealthResource, "/health")
+api.add_resource(MetricsResource, "/metrics")
+
+api.add_resource(JobResource, "/jobs/<id>")
 
 api.add_resource(MeCommitteeResource, "/me/committees")
 api.add_resource(AuthenticationResource, "/auth")
@@ -124,6 +142,29 @@ def send_thumbnail(filename):
     THUMBNAIL_FOLDER = os.path.join(os.getcwd(), "static", "thumbnails")
     return send_from_directory(THUMBNAIL_FOLDER, filename)
 
+# FLASK_APP=api flask migrate
+@app.cli.command("migrate")
+def migrate():
+    """Kör de databasmigreringar som inte har körts än."""
+    for name in migrations.upgrade(db.engine):
+        print("Körde", name)
+
+# FLASK_APP=api flask rebuild-search-index
+@app.cli.command("rebuild-search-index")
+def rebuild_search_index():
+    """Bygger om sökindexet från databasen."""
+    with db.engine.begin() as connection:
+        search_index.drop(connection)
+        search_index.create(connection)
+        search_index.rebuild(connection)
+
+# FLASK_APP=api flask worker --processes 2
+@app.cli.command("worker")
+@click.option("--processes", default=int(os.getenv("JOB_WORKERS", 2)), help="Antal jobbworkers.")
+def worker(processes):
+    """Kör bakgrundsjobb, som uppladdningar av dokument och videor."""
+    jobs.work_pool(app, processes)
+
 if app.debug:
     @app.route("/create_all")
     def route_create_all():
@@ -138,9 +179,14 @@ if app.debug:
         from api.models.album import Album
         from api.models.video import Video
         from api.models.event import Event
+        from api.models.table_version import TableVersion
 
         db.drop_all()
         db.create_all()
+        with db.engine.begin() as connection:
+            search_index.drop(connection)
+            search_index.create(connection)
+        migrations.stamp(db.engine)
 
 
         def create_committee_category(name, weight, email=""):
@@ -1,3 +1,70 @@
-from flask_sqlalchemy import SQLAlchemy
+from flask import request
+from flask_sqlalchemy import SQLAlchemy, SignallingSession
+from sqlalchemy import event, orm
+from functools import wraps
 
-db = SQLAlchemy()
\ No newline at end of file
+
+class RoutingSession(SignallingSession):
+    """
+    Sends the reads of a request marked with reads_from_replica to the "replica" bind,
+    if SQLALCHEMY_BINDS has one. Flushes, and everything after a write in the same
+    request, go to the primary database.
+    """
+
+    def __init__(self, db, **options):
+        self.db = db
+        SignallingSession.__init__(self, db, **options)
+
+    def reads_from_replica(self):
+        """
+        @returns if the reads of this session currently go to the replica
+        """
+        return bool(self.info.get("replica") and not self.info.get("wrote")
+            and "replica" in (self.app.config.get("SQLALCHEMY_BINDS") or {}))
+
+    def read_from_primary(self):
+        """
+        sends the rest of the request's reads to the primary, e.g. when the replica is behind
+        """
+        self.info["replica"] = False
+
+    def get_bind(self, mapper=None, clause=None):
+        if self.reads_from_replica() and not self._flushing:
+            return self.db.get_engine(self.app, bind="replica")
+        return SignallingSession.get_bind(self, mapper, clause)
+
+
+class RoutingSQLAlchemy(SQLAlchemy):
+    def create_session(self, options):
+        return orm.sessionmaker(class_=RoutingSession, db=self, **options)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _after_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_bulk_update")
+@event.listens_for(RoutingSession, "after_bulk_delete")
+def _after_bulk(context):
+    context.session.info["wrote"] = True
+
+
+db = RoutingSQLAlchemy()
+
+
+def reads_from_replica(f):
+    """
+    lets a GET handler read from the replica. Requests with a token stay on the primary
+    so that a user always sees their own changes.
+    """
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        if request.headers.get("token"):
+            return f(*args, **kwargs)
+        db.session.info["replica"] = True
+        try:
+            return f(*args, **kwargs)
+        finally:
+            db.session.info.pop("replica", None)
+    return decorated
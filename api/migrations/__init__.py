@@ -0,0 +1,104 @@
+"""
+Databasmigreringar. Varje modul vNNN_namn.py i den här mappen har en upgrade(connection)
+och en downgrade(connection) och körs i nummerordning. Vilka som har körts sparas i
+tabellen schema_migrations. Alla migreringar kontrollerar själva vad som redan finns,
+så de går att köra mot både en helt ny databas och en som skapats med /create_all.
+
+    FLASK_APP=api flask migrate
+"""
+from sqlalchemy import inspect, Table, Column, String, DateTime, MetaData
+
+from datetime import datetime
+import importlib
+import pkgutil
+
+migrations_table = Table("schema_migrations", MetaData(),
+    Column("name", String, primary_key=True),
+    Column("applied_at", DateTime, nullable=False)
+)
+
+
+def migrations():
+    """
+    @returns migrations: (name, module) for every migration, in the order they are applied
+    """
+    names = sorted(name for _, name, _ in pkgutil.iter_modules(__path__) if name.startswith("v"))
+    return [(name, importlib.import_module(__name__ + "." + name)) for name in names]
+
+
+def applied(connection):
+    migrations_table.create(connection, checkfirst=True)
+    return set(name for name, in connection.execute(migrations_table.select().with_only_columns([migrations_table.c.name])))
+
+
+def upgrade(engine, target=None):
+    """
+    applies every migration that hasn't been applied, up to and including target
+    @returns names: the migrations that were applied
+    """
+    done = []
+    for name, module in migrations():
+        with engine.begin() as connection:
+            if name not in applied(connection):
+                module.upgrade(connection)
+                connection.execute(migrations_table.insert(), {"name": name, "applied_at": datetime.utcnow()})
+                done.append(name)
+        if name == target:
+            break
+    return done
+
+
+def downgrade(engine, target):
+    """
+    reverts every applied migration after target, newest first
+    @returns names: the migrations that were reverted
+    """
+    done = []
+    for name, module in reversed(migrations()):
+        if name <= target:
+            break
+        with engine.begin() as connection:
+            if name in applied(connection):
+                module.downgrade(connection)
+                connection.execute(migrations_table.delete().where(migrations_table.c.name == name))
+                done.append(name)
+    return done
+
+
+def stamp(engine):
+    """
+    marks every migration as applied, used after the tables have been created from the models
+    """
+    with engine.begin() as connection:
+        done = applied(connection)
+        rows = [{"name": name, "applied_at": datetime.utcnow()} for name, _ in migrations() if name not in done]
+        if rows:
+            connection.execute(migrations_table.insert(), rows)
+
+
+def quote(connection, name):
+    return connection.dialect.identifier_preparer.quote(name)
+
+
+def has_column(connection, table, column):
+    return column in [c["name"] for c in inspect(connection).get_columns(table)]
+
+
+def has_index(connection, table, name):
+    return name in [index["name"] for index in inspect(connection).get_indexes(table)]
+
+
+def add_column(connection, table, column, definition):
+    if not has_column(connection, table, column):
+        connection.execute("ALTER TABLE %s ADD COLUMN %s %s" % (quote(connection, table), quote(connection, column), definition))
+
+
+def create_index(connection, name, table, columns):
+    if not has_index(connection, table, name):
+        connection.execute("CREATE INDEX %s ON %s (%s)" % (
+            quote(connection, name), quote(connection, table), ", ".join(quote(connection, column) for column in columns)))
+
+
+def drop_index(connection, name, table):
+    if has_index(connection, table, name):
+        connection.execute("DROP INDEX %s" % quote(connection, name))
@@ -0,0 +1,26 @@
+"""
+Skapar de tabeller som saknas utifrån modellerna, i en ny databas är det alla.
+"""
+from api.db import db
+
+# Modellerna måste vara importerade för att finnas i db.metadata
+from api.models.user import User
+from api.models.committee import Committee, CommitteeCategory
+from api.models.committee_post import CommitteePost, CommitteePostTerm
+from api.models.document import Document, Tag, DocumentTags
+from api.models.post import Post
+from api.models.page import Page, PageRevision
+from api.models.post_tag import PostTag
+from api.models.image import Image
+from api.models.album import Album
+from api.models.video import Video
+from api.models.event import Event
+from api.models.table_version import TableVersion
+
+
+def upgrade(connection):
+    db.metadata.create_all(connection, checkfirst=True)
+
+
+def downgrade(connection):
+    pass
@@ -0,0 +1,15 @@
+"""
+Versionskolumnerna som cachen för serialiserade rader bygger på.
+"""
+from api.migrations import add_column
+
+VERSIONED_TABLES = ["post", "event", "committee", "committee_post"]
+
+
+def upgrade(connection):
+    for table in VERSIONED_TABLES:
+        add_column(connection, table, "version", "INTEGER NOT NULL DEFAULT 1")
+
+
+def downgrade(connection):
+    pass
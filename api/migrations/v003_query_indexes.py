@@ -0,0 +1,36 @@
+"""
+Index för filtren som körs vid varje anrop: publicerade inlägg och event, pågående mandat,
+funktionärsadresser, senaste publicerade sidversion och kopplingstabellerna.
+"""
+from api.migrations import create_index, drop_index
+
+INDEXES = [
+    ("ix_post_draft_scheduled_date_date", "post", ["draft", "scheduled_date", "date"]),
+    ("ix_post_scheduled_date_date_id", "post", ["scheduled_date", "date", "id"]),
+    ("ix_event_draft_scheduled_date", "event", ["draft", "scheduled_date"]),
+    ("ix_event_event_date", "event", ["event_date"]),
+    ("ix_event_scheduled_date_date_id", "event", ["scheduled_date", "date", "id"]),
+    ("ix_committee_post_term_post_id_start_date_end_date", "committee_post_term", ["post_id", "start_date", "end_date"]),
+    ("ix_committee_post_term_user_id", "committee_post_term", ["user_id"]),
+    ("ix_committee_post_officials_email", "committee_post", ["officials_email"]),
+    ("ix_page_revision_page_id_published_timestamp", "page_revision", ["page_id", "published", "timestamp"]),
+    ("ix_association_post_id_tag_id", "association", ["post_id", "tag_id"]),
+    ("ix_association_tag_id", "association", ["tag_id"]),
+    ("ix_event_Tags_event_id_tag_id", "event_Tags", ["event_id", "tag_id"]),
+    ("ix_event_Tags_tag_id", "event_Tags", ["tag_id"]),
+    ("ix_album_images_album_id_image_id", "album_images", ["album_id", "image_id"]),
+    ("ix_album_images_image_id", "album_images", ["image_id"]),
+    ("ix_album_videos_video_id", "album_videos", ["video_id"]),
+    ("ix_document_tags_itemId", "document_tags", ["itemId"]),
+    ("ix_document_tags_tagId_itemId", "document_tags", ["tagId", "itemId"]),
+]
+
+
+def upgrade(connection):
+    for name, table, columns in INDEXES:
+        create_index(connection, name, table, columns)
+
+
+def downgrade(connection):
+    for name, table, columns in reversed(INDEXES):
+        drop_index(connection, name, table)
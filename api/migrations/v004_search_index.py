@@ -0,0 +1,14 @@
+"""
+Fulltextindex för /search: en FTS5-tabell på SQLite och en tabell med tsvector och GIN-index
+på Postgres. Indexet fylls med allt som redan finns och hålls sedan uppdaterat vid varje flush.
+"""
+from api.utility import search_index
+
+
+def upgrade(connection):
+    search_index.create(connection)
+    search_index.rebuild(connection)
+
+
+def downgrade(connection):
+    search_index.drop(connection)
@@ -0,0 +1,16 @@
+"""
+Inlägg, event och sidor i sökindexet. Indexet får en kolumn för publiceringsdatum,
+så det skapas om och fylls på nytt.
+"""
+from api.utility import search_index
+
+
+def upgrade(connection):
+    search_index.drop(connection)
+    search_index.create(connection)
+    search_index.rebuild(connection)
+
+
+def downgrade(connection):
+    # Indexet finns bara i sin senaste form, v004 tar bort det helt
+    pass
@@ -0,0 +1,19 @@
+"""
+Nedskalade varianter i WebP (och AVIF) av albumbilder, inläggens omslagsbilder och profilbilder.
+"""
+from api.migrations import add_column
+
+COLUMNS = [
+    ("images", "derivatives"),
+    ("post", "header_image_derivatives"),
+    ("user", "profile_picture_derivatives"),
+]
+
+
+def upgrade(connection):
+    for table, column in COLUMNS:
+        add_column(connection, table, column, "JSON")
+
+
+def downgrade(connection):
+    pass
@@ -6,12 +6,15 @@ imageAssociation = db.Table('album_images', db.Model.metadata,
                             db.Column('album_id', db.Integer,
                                       db.ForeignKey('albums.albumId')),
                             db.Column('image_id', db.Integer,
-                                      db.ForeignKey('images.imageId'))
+                                      db.ForeignKey('images.imageId')),
+                            db.Index('ix_album_images_album_id_image_id', 'album_id', 'image_id'),
+                            db.Index('ix_album_images_image_id', 'image_id')
                             )
 
 video_playlist_table = db.Table('album_videos', db.Model.metadata,
     db.Column('album_id', db.Integer, db.ForeignKey('albums.albumId'), primary_key=True),
-    db.Column('video_id', db.Integer, db.ForeignKey('video.id'), primary_key=True)
+    db.Column('video_id', db.Integer, db.ForeignKey('video.id'), primary_key=True),
+    db.Index('ix_album_videos_video_id', 'video_id')
 )
 
 
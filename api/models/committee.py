@@ -33,13 +33,18 @@ class Committee(db.Model):
     page = db.relationship("Page", back_populates="committee")
     category_id = db.Column(db.Integer, db.ForeignKey('CommitteeCategory.id'))
     category = db.relationship("CommitteeCategory")
+    version = db.Column(db.Integer, nullable=False, default=1)
 
-    def to_dict(self):
-        posts = [post.to_dict() for post in self.posts]
+    def to_dict(self, current_terms=None, author_terms=None):
+        """
+        @param current_terms: optional dict of post id -> current terms, used instead of querying each post
+        @param author_terms: optional list of the page author's terms, passed on to the page
+        """
+        posts = self.posts_to_dict(current_terms)
         events = [event.to_dict() for event in self.events]
 
         if self.page != None:
-            page = self.page.to_dict()
+            page = self.page.to_dict(current_terms, author_terms)
         else:
             page = None
 
@@ -55,8 +60,8 @@ class Committee(db.Model):
             "events": events,
         }
     
-    def to_dict_without_page(self):
-        posts = [post.to_dict() for post in self.posts]
+    def to_dict_without_page(self, current_terms=None):
+        posts = self.posts_to_dict(current_terms)
         events = [event.to_dict() for event in self.events]
 
         return {
@@ -70,6 +75,11 @@ class Committee(db.Model):
             "events": events,
         }
 
+    def posts_to_dict(self, current_terms=None):
+        if current_terms is None:
+            return [post.to_dict() for post in self.posts]
+        return [post.to_dict(current_terms.get(post.id, [])) for post in self.posts]
+
     def to_basic_dict(self):
         return {
             "id": self.id,
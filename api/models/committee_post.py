@@ -5,6 +5,7 @@ from datetime import datetime
 import re
 
 class CommitteePost(db.Model):
+    __table_args__ = (db.Index("ix_committee_post_officials_email", "officials_email"),)
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String)
     officials_email = db.Column(db.String)
@@ -13,6 +14,7 @@ class CommitteePost(db.Model):
     is_official = db.Column(db.Boolean)
     terms = db.relationship("CommitteePostTerm", back_populates="post")
     weight = db.Column(db.Integer, default=1)
+    version = db.Column(db.Integer, nullable=False, default=1)
 
     def soft_hyphenate(self, name):
         words = ["ansvarig", "skyddsombud", "ordförande", "frågor", "ombud", "ledare"]
@@ -34,9 +36,12 @@ class CommitteePost(db.Model):
         term.end_date = end_date
         return term
     
-    def to_dict(self):
+    def to_dict(self, current_terms=None):
+        """
+        @param current_terms: the post's current terms if they are already loaded, otherwise they are queried
+        """
         terms = []
-        for term in self.current_terms():
+        for term in (self.current_terms() if current_terms is None else current_terms):
             terms.append({
                 "id": term.id,
                 "startDate": term.start_date,
@@ -91,6 +96,10 @@ class CommitteePost(db.Model):
 
 class CommitteePostTerm(db.Model):
     __tablename__ = "committee_post_term"
+    __table_args__ = (
+        db.Index("ix_committee_post_term_post_id_start_date_end_date", "post_id", "start_date", "end_date"),
+        db.Index("ix_committee_post_term_user_id", "user_id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     post_id = db.Column(db.Integer, db.ForeignKey('committee_post.id'))
     post = db.relationship("CommitteePost", back_populates="terms")
@@ -12,11 +12,14 @@ class Document(db.Model):
     fileName = db.Column(db.String)
     thumbnail = db.Column(db.String)
 
-    def to_dict(self):
+    def to_dict(self, tags=None):
+        """
+        @param tags: optional dict of tag id -> serialized tag, used instead of querying each tag
+        """
         return {
             "id": self.itemId,
             "title": {"se": self.title, "en": self.title_en},
-            "tags": [res.serialize() for res in self.tags],
+            "tags": [res.serialize(tags) for res in self.tags],
             "filename": self.fileName,
             "date": self.date.strftime("%Y-%m-%d"),
             "thumbnail": self.thumbnail
@@ -40,10 +43,16 @@ class Tag(db.Model):
 
 
 class DocumentTags(db.Model):
+    __table_args__ = (
+        db.Index("ix_document_tags_itemId", "itemId"),
+        db.Index("ix_document_tags_tagId_itemId", "tagId", "itemId"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     itemId = db.Column(db.Integer, db.ForeignKey("documents.itemId"))
     tagId = db.Column(db.Integer, db.ForeignKey("tags.tagId"))
 
-    def serialize(self):
+    def serialize(self, tags=None):
+        if tags is not None and self.tagId in tags:
+            return tags[self.tagId]
         tag = Tag.query.get(self.tagId)
         return tag.to_dict()
@@ -7,11 +7,19 @@ from api.models.post_tag import PostTag
 #Association table for tags and events
 events_tags = db.Table('event_Tags', db.Model.metadata,
     db.Column('event_id', db.Integer, db.ForeignKey('event.id')),
-    db.Column('tag_id', db.Integer, db.ForeignKey('post_tag.id'))
+    db.Column('tag_id', db.Integer, db.ForeignKey('post_tag.id')),
+    db.Index('ix_event_Tags_event_id_tag_id', 'event_id', 'tag_id'),
+    db.Index('ix_event_Tags_tag_id', 'tag_id')
 )
 
 class Event(db.Model):
     __tablename__ = "event"
+    __table_args__ = (
+        db.Index("ix_event_draft_scheduled_date", "draft", "scheduled_date"),
+        db.Index("ix_event_event_date", "event_date"),
+        # Ordningen i flödet, används för cursor-paginering
+        db.Index("ix_event_scheduled_date_date_id", "scheduled_date", "date", "id"),
+    )
     id = db.Column(db.Integer, primary_key = True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"),
         nullable=False)
@@ -30,6 +38,7 @@ class Event(db.Model):
     facebook_link = db.Column(db.String)
     event_date = db.Column(db.DateTime, default=datetime.datetime.utcnow())
     end_date = db.Column(db.DateTime, default=datetime.datetime.utcnow() + datetime.timedelta(hours=5))
+    version = db.Column(db.Integer, nullable=False, default=1)
 
     def to_dict(self):
         com = None
@@ -7,6 +7,7 @@ class Image(db.Model):
     __tablename__ = "images"
     imageId = db.Column(db.Integer, primary_key = True)
     url = db.Column(db.String)
+    derivatives = db.Column(db.JSON) # nedskalade varianter av url, se api/utility/images.py
     photographer = db.Column(db.String) #TODO: reformat to foreignKey linked to user
     date = db.Column(db.DateTime, default = datetime.datetime.now)
     needsCred = db.Column(db.Boolean)
@@ -16,6 +17,7 @@ class Image(db.Model):
         return {
             "id": self.imageId,
             "url": self.url,
+            "derivatives": self.derivatives or [],
             "photographer": self.photographer,
             "date": self.date,
             "needsCrediting": self.needsCred,
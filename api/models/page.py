@@ -1,4 +1,5 @@
 from api.db import db
+from api.utility.permissions import committee_ids
 import datetime
 import enum
 
@@ -20,16 +21,12 @@ class Page(db.Model):
         if self.committee == None:
             return False
 
-        for term in user.post_terms:
-            committee_id = term.post.committee_id
-            if self.committee.id == committee_id:
-                return True
-        return False
+        return self.committee.id in committee_ids(user)
 
-    def to_dict(self):
+    def to_dict(self, current_terms=None, author_terms=None):
         current = self.latest_published_revision()
         published = current != None
-        committee = self.committee.to_dict_without_page() if self.committee != None else None
+        committee = self.committee.to_dict_without_page(current_terms) if self.committee != None else None
 
         if published:
             title_sv = current.title_sv
@@ -37,7 +34,7 @@ class Page(db.Model):
             content_sv = current.content_sv
             content_en = current.content_en
             image = current.image
-            author = current.author.to_dict() if current.author != None else None
+            author = current.author.to_dict(author_terms) if current.author != None else None
             updated = current.timestamp
         else:
             title_sv = None
@@ -64,6 +61,7 @@ class Page(db.Model):
         }
 
 class PageRevision(db.Model):
+    __table_args__ = (db.Index("ix_page_revision_page_id_published_timestamp", "page_id", "published", "timestamp"),)
     id = db.Column(db.Integer, primary_key=True)
     timestamp = db.Column(db.DateTime, default=datetime.datetime.now)
     revision_type = db.Column(db.Enum(PageRevisionType))
@@ -7,10 +7,17 @@ from api.models.post_tag import PostTag
 
 posts_tags = db.Table('association', db.Model.metadata,
     db.Column('post_id', db.Integer, db.ForeignKey('post.id')),
-    db.Column('tag_id', db.Integer, db.ForeignKey('post_tag.id'))
+    db.Column('tag_id', db.Integer, db.ForeignKey('post_tag.id')),
+    db.Index('ix_association_post_id_tag_id', 'post_id', 'tag_id'),
+    db.Index('ix_association_tag_id', 'tag_id')
 )
 
 class Post(db.Model):
+    __table_args__ = (
+        db.Index("ix_post_draft_scheduled_date_date", "draft", "scheduled_date", "date"),
+        # Ordningen i flödet, används för cursor-paginering
+        db.Index("ix_post_scheduled_date_date_id", "scheduled_date", "date", "id"),
+    )
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String, nullable=False)
     title_en = db.Column(db.String, nullable=True)
@@ -18,6 +25,7 @@ class Post(db.Model):
     scheduled_date = db.Column(db.DateTime, default=None, nullable=True)
     draft = db.Column(db.Boolean, default=False)
     header_image = db.Column(db.String, default="https://api.medieteknik.com/static/posts/default.png")
+    header_image_derivatives = db.Column(db.JSON)
     body = db.Column(db.String, nullable=False)
     body_en = db.Column(db.String, nullable=True)
     user_id = db.Column(db.Integer, db.ForeignKey("user.id"),
@@ -26,6 +34,7 @@ class Post(db.Model):
         nullable=True)
     tags = db.relationship("PostTag",
                     secondary=posts_tags)
+    version = db.Column(db.Integer, nullable=False, default=1)
 
     def to_dict(self):
         return {
@@ -38,6 +47,7 @@ class Post(db.Model):
             "scheduled_date": self.scheduled_date,
             "draft": self.draft,
             "header_image": self.header_image,
+            "header_image_derivatives": self.header_image_derivatives or [],
             "body": {
                 "se": self.body,
                 "en": self.body_en
@@ -0,0 +1,16 @@
+from api.db import db
+import datetime
+
+
+class TableVersion(db.Model):
+    __tablename__ = "table_version"
+    name = db.Column(db.String, primary_key=True)
+    version = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.datetime.utcnow)
+
+    def to_dict(self):
+        return {
+            "name": self.name,
+            "version": self.version,
+            "updatedAt": self.updated_at
+        }
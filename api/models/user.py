@@ -9,6 +9,7 @@ class User(db.Model):
     email = db.Column(db.String)
     profile_picture = db.Column(
         db.String, default="/static/profiles/default.png")
+    profile_picture_derivatives = db.Column(db.JSON)
     first_name = db.Column(db.String)
     last_name = db.Column(db.String)
     frack_name = db.Column(db.String, nullable=True)
@@ -19,10 +20,13 @@ class User(db.Model):
     post_terms = db.relationship("CommitteePostTerm", back_populates="user", lazy='dynamic')
     is_admin = db.Column(db.Boolean, default=False)
 
-    def to_dict(self):
+    def to_dict(self, post_terms=None):
+        """
+        @param post_terms: the user's terms if they are already loaded, otherwise they are queried
+        """
         terms = []
 
-        for term in self.post_terms:
+        for term in (self.post_terms if post_terms is None else post_terms):
             terms.append({"post": term.post.to_dict_without_terms(),
                           "startDate": term.start_date,
                           "endDate": term.end_date})
@@ -31,6 +35,7 @@ class User(db.Model):
                 "email": self.email,
                 "kthId": self.kth_id,
                 "profilePicture": self.profile_picture,
+                "profilePictureDerivatives": self.profile_picture_derivatives or [],
                 "firstName": self.first_name,
                 "lastName": self.last_name,
                 "frackName": self.frack_name,
@@ -47,6 +52,7 @@ class User(db.Model):
                 "email": self.email,
                 "kthId": self.kth_id,
                 "profilePicture": self.profile_picture,
+                "profilePictureDerivatives": self.profile_picture_derivatives or [],
                 "firstName": self.first_name,
                 "lastName": self.last_name,
                 "frackName": self.frack_name,
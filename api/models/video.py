@@ -14,11 +14,14 @@ class Video(db.Model):
     albums = db.relationship("Album", secondary=video_playlist_table)
 
     def to_dict(self):
+        # Playback id saknas tills Mux har bearbetat en nyss uppladdad video
+        ready = self.mux_playback_id is not None
         return {
             "id": self.id,
             "title": self.title,
-            "url": "https://stream.mux.com/" + self.mux_playback_id + ".m3u8",
-            "thumbnail": "https://image.mux.com/" + self.mux_playback_id + "/thumbnail.jpg",
+            "url": "https://stream.mux.com/" + self.mux_playback_id + ".m3u8" if ready else None,
+            "thumbnail": "https://image.mux.com/" + self.mux_playback_id + "/thumbnail.jpg" if ready else None,
+            "ready": ready,
             "uploadedAt": self.uploaded_at,
             "requiresLogin": self.requires_login,
             "albums": [album.albumId for album in self.albums]
@@ -3,12 +3,26 @@ from flask_restful import Resource, inputs
 
 from api.models.image import Image
 from api.models.album import Album
-from api.utility.storage import upload_album_photo
-from api.db import db
+from api.models.video import Video
+from api.utility.storage import upload_album_photo, upload_all, upload_errors
+from api.utility.images import queue_derivatives
+from api.db import db, reads_from_replica
 from api.resources.authentication import requires_auth
+from api.utility.versions import conditional
+from api.utility.pagination import paginate
 
 from datetime import datetime
 ISO_DATE_DEF = "%Y-%m-%dT%H:%M:%S.%fZ"
+
+def queue_album_derivatives(album, results):
+    """
+    queues the scaled variants of every photo that was uploaded, once the images have ids
+    """
+    images = {image.url: image for image in album.images}
+    for photo, url, error in results:
+        if error is None:
+            queue_derivatives("image", images[url].imageId, url, photo)
+
 class AlbumListResource(Resource):
     @requires_auth
     def post(self, user):
@@ -37,34 +51,40 @@ class AlbumListResource(Resource):
         needsCred = inputs.boolean(data.get("needsCred"))
         editingAllowed = inputs.boolean(data.get("editingAllowed"))
 
-        photos = request.files.getlist("photos")
-        if photos:
-            for photo in photos:
-                image = Image()
-                image.url = upload_album_photo(photo, album.title)
-                if photographer:
-                    image.photographer = photographer
-                if albumDate:
-                    image.date = albumDate
-                image.needsCred = needsCred
-                image.editingAllowed = editingAllowed 
-                album.images.append(image)
-                db.session.add(image)
+        # Bilderna laddas upp parallellt och läggs till i en commit när alla är klara
+        results = upload_all(upload_album_photo, request.files.getlist("photos"), album.title)
+        for photo, url, error in results:
+            if error is not None:
+                continue
+            image = Image()
+            image.url = url
+            if photographer:
+                image.photographer = photographer
+            if albumDate:
+                image.date = albumDate
+            image.needsCred = needsCred
+            image.editingAllowed = editingAllowed 
+            album.images.append(image)
         
         ## TODO: Details for each photo
 
         db.session.add(album)
         db.session.commit()
-        return jsonify(success=True, id=album.albumId)
+        queue_album_derivatives(album, results)
+        return jsonify(success=True, id=album.albumId, failed=upload_errors(results))
 
+    @reads_from_replica
+    @conditional(Album, Image, Video)
     def get(self):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
-        albums = Album.query.paginate(page=page, per_page=per_page)
+        albums = paginate(Album.query, page, per_page)
         data = [album.to_dict() for album in albums.items]
-        return jsonify({"data": data, "totalCount": albums.total})
+        return jsonify(albums.to_dict(data))
 
 class AlbumResource(Resource):
+    @reads_from_replica
+    @conditional(Album, Image, Video)
     def get(self, id):
         album = Album.query.get_or_404(id)
         return jsonify(album.to_dict())
@@ -81,18 +101,18 @@ class AlbumResource(Resource):
 
         ## TODO: Remove images from albums
 
-        photos = request.files.getlist("photos")
-        if photos:
-            for photo in photos:
+        results = upload_all(upload_album_photo, request.files.getlist("photos"), album.title)
+        for photo, url, error in results:
+            if error is None:
                 image = Image()
-                image.url = upload_album_photo(photo, album.title)
+                image.url = url
                 album.images.append(image)
-                db.session.add(image)
 
         album.lastEdit = datetime.now()
 
         db.session.commit()
-        return jsonify({"message": "ok"})
+        queue_album_derivatives(album, results)
+        return jsonify({"message": "ok", "failed": upload_errors(results)})
 
     @requires_auth
     def delete(self, id, user):
@@ -6,34 +6,122 @@ from flask_oidc import OpenIDConnect
 from itsdangerous import (TimedJSONWebSignatureSerializer
                           as Serializer, BadSignature, SignatureExpired)
 
-import cachecontrol
-import google.auth.transport.requests
-import requests
-from google.oauth2 import id_token
+from google.auth import jwt
+from sqlalchemy import and_, or_, inspect
+from sqlalchemy.orm import make_transient_to_detached
 
+from api.db import db
 from api.models.user import User
-from api.models.committee_post import CommitteePost
+from api.models.committee_post import CommitteePost, CommitteePostTerm
+from api.utility.cache import TTLCache
+from api.utility.signing_keys import SigningKeyStore
+from api.utility.versions import VersionedCache
 
+from datetime import datetime
+import hashlib
 import os
 
-secret = os.getenv("SECRET_KEY", "2kfueoVmpd0FBVFCJD0V")
+# API-tokens signeras bara med en nyckel som faktiskt är satt, aldrig med ett standardvärde
+secret = os.getenv("SECRET_KEY")
 # oidc = OpenIDConnect()
 
-def check_token(token):
-    session = requests.session()
-    cached_session = cachecontrol.CacheControl(session)
-    request = google.auth.transport.requests.Request(session=cached_session)
+CLIENT_ID = '881584931454-ankmp9jr660l8c1u91cbueb4eaqeddbt.apps.googleusercontent.com'
+
+# Googles nycklar hämtas en gång per process, GOOGLE_CERTS_FILE kan peka på en lokal fil vid test
+signing_keys = SigningKeyStore(key_file=os.getenv("GOOGLE_CERTS_FILE"))
+
+# Verifierade tokens sparas tills de går ut så att signaturen inte kontrolleras vid varje anrop
+verified_tokens = TTLCache(maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 1024)))
+
+def token_digest(token):
+    if isinstance(token, str):
+        token = token.encode("utf-8")
+    return hashlib.sha256(token).hexdigest()
+
+def verify_token(token):
+    """
+    verify a Google ID token
+    @param token: the encoded ID token
+    @returns (userid, expires_at): the email of the token owner and the unix time when the token expires, or None if invalid
+    """
+    digest = token_digest(token)
+    verified = verified_tokens.get(digest)
+    if verified:
+        return verified
 
     try:
-        id_info = id_token.verify_token(token, request, '881584931454-ankmp9jr660l8c1u91cbueb4eaqeddbt.apps.googleusercontent.com')
+        id_info = jwt.decode(token, certs=signing_keys.certs_for(token), audience=CLIENT_ID)
     except:
         return None
 
     if id_info['iss'] != 'accounts.google.com':
         return None
 
-    userid = id_info['email']
-    return userid
+    verified = (id_info['email'], id_info['exp'])
+    verified_tokens.set(digest, verified, expires_at=id_info['exp'])
+    return verified
+
+def check_token(token):
+    verified = verify_token(token)
+    return verified[0] if verified else None
+
+def resolve_principal(user_id):
+    """
+    find the acting user for a verified email in one query, either the user with
+    that KTH id or the current holder of the official post with that email
+    """
+    now = datetime.now()
+    is_user = User.kth_id == user_id
+    return User.query.outerjoin(User.post_terms).outerjoin(CommitteePostTerm.post).filter(
+        or_(
+            is_user,
+            and_(
+                CommitteePost.officials_email == user_id,
+                CommitteePostTerm.start_date <= now,
+                CommitteePostTerm.end_date >= now
+            )
+        )).order_by(is_user.desc()).first()
+
+def detached_copy(user):
+    copy = User()
+    for attr in inspect(User).column_attrs:
+        setattr(copy, attr.key, getattr(user, attr.key))
+    make_transient_to_detached(copy)
+    return copy
+
+# Egna API-tokens som delas ut av /auth, kontrolleras med HMAC. Utan SECRET_KEY delas inga ut.
+API_TOKEN_EXPIRES_IN = int(os.getenv("API_TOKEN_EXPIRES_IN", 1800))
+api_tokens = Serializer(secret, expires_in=API_TOKEN_EXPIRES_IN) if secret else None
+
+def issue_api_token(user):
+    """
+    @returns token: an API token carrying only the user id, or None if SECRET_KEY isn't set
+    """
+    if api_tokens is None:
+        return None
+    return api_tokens.dumps({"id": user.id}).decode("ascii")
+
+def load_api_token(token):
+    """
+    load the user from an API token issued by /auth. The token only identifies the user,
+    admin rights and committee memberships are read from the database.
+    @returns user: the User, or None if the token isn't a valid API token or the user is gone
+    """
+    if api_tokens is None:
+        return None
+    try:
+        data = api_tokens.loads(token)
+    except BadSignature:
+        return None
+
+    return User.query.get(data["id"])
+
+# Inloggade användare sparas per token tills tokenet går ut eller någon process skriver till tabellerna
+principals = VersionedCache(User, CommitteePost, CommitteePostTerm, maxsize=int(os.getenv("TOKEN_CACHE_SIZE", 1024)))
+
+def load_principal(user_id):
+    user = resolve_principal(user_id)
+    return detached_copy(user) if user else None
 
 def requires_auth(f):
     @wraps(f)
@@ -43,21 +131,26 @@ def requires_auth(f):
             return {
                 "message": "Missing token"
             }, 400
-        
-        user_id = check_token(token)
-        if not user_id:
+
+        user = load_api_token(token)
+        if user is not None:
+            kwargs["user"] = user
+            return f(*args, **kwargs)
+
+        verified = verify_token(token)
+        if not verified:
             return {
                 "message": "Invalid token"
             }, 401
-        
-        user = User.query.filter_by(kth_id=user_id).first()
-        official = CommitteePost.query.filter_by(officials_email=user_id).first()
-        if not user and not official:
+        user_id, expires_at = verified
+
+        principal = principals.get_or_load(token_digest(token), lambda: load_principal(user_id), expires_at=expires_at)
+        if principal is None:
             return {
                 "message": "Invalid user"
             }, 401
-        
-        kwargs["user"] = user if user else official.current_terms()[0].user
+
+        kwargs["user"] = db.session.merge(principal, load=False)
         return f(*args, **kwargs)
 
     return decorated
@@ -74,25 +167,23 @@ class AuthenticationResource(Resource):
                     "message": "Invalid token"
                 }, 400
 
-            user = User.query.filter_by(kth_id=user_id).first()
-            official = CommitteePost.query.filter_by(officials_email=user_id).first()
-            if not user and not official:
+            user = resolve_principal(user_id)
+            if not user:
                 return {
+                    "authenticated": False,
                     "message": "Invalid user"
                 }, 401
 
-            if not user and not official:
-                return {
-                    "authenticated": False,
-                    "message": "Invalid user"
-                }, 404
-            else:
-                response = {
-                    "authenticated": True,
-                    "user": (user if user else official).to_dict()
-                }
-
-                return jsonify(response)
+            response = {
+                "authenticated": True,
+                "user": user.to_dict()
+            }
+            api_token = issue_api_token(user)
+            if api_token is not None:
+                response["token"] = api_token
+                response["expiresIn"] = API_TOKEN_EXPIRES_IN
+
+            return jsonify(response)
         else:
             return {
                 "message": "Missing token"
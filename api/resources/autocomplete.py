@@ -0,0 +1,30 @@
+from flask import jsonify, request
+from flask_restful import Resource
+
+from api.db import db, reads_from_replica
+from api.utility.autocomplete import autocomplete, TOP_K
+
+class AutocompleteResource(Resource):
+    @reads_from_replica
+    def get(self):
+        """
+        Returns suggestions for a search box: committees, committee posts, users and documents
+        whose name has a word starting with q.
+        ---
+        tags:
+            - Search
+        parameters:
+            - name: q
+              in: query
+              schema:
+                type: string
+            - name: limit
+              in: query
+              schema:
+                type: integer
+        """
+        prefix = request.args.get('q', "")
+        limit = min(max(request.args.get('limit', TOP_K, type=int), 1), TOP_K)
+        if not prefix.strip():
+            return jsonify({"data": []})
+        return jsonify({"data": autocomplete.complete(db.session, prefix, limit)})
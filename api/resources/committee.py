@@ -1,16 +1,67 @@
 from flask import jsonify, request
 from flask_restful import Resource
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.orm.attributes import set_committed_value
 
-from api.models.committee import Committee
+from api.models.committee import Committee, CommitteeCategory
 from api.models.committee_post import CommitteePost, CommitteePostTerm
+from api.models.event import Event
+from api.models.page import Page, PageRevision
+from api.models.post_tag import PostTag
+from api.models.user import User
 from api.resources.authentication import requires_auth
+from api.utility.fragments import cached_dict
+from api.utility.versions import conditional
+from api.utility.response_cache import cached_response
+from api.utility.pagination import paginate
+from api.utility.terms import latest_term_change
 
-from api.db import db
+from api.db import db, reads_from_replica
+
+from collections import defaultdict
+from datetime import datetime
+
+def committee_to_dict(id):
+    """
+    serializes a committee with its posts, current officials, events and page
+    in a fixed number of queries, no matter how many posts or events it has
+    """
+    committee = Committee.query.options(
+        joinedload(Committee.category),
+        selectinload(Committee.posts),
+        selectinload(Committee.events).selectinload(Event.tags),
+        joinedload(Committee.page).selectinload(Page.revisions).joinedload(PageRevision.author)
+    ).filter(Committee.id == id).first_or_404()
+
+    now = datetime.now()
+    current_terms = defaultdict(list)
+    post_ids = [post.id for post in committee.posts]
+    if post_ids:
+        terms = CommitteePostTerm.query.options(joinedload(CommitteePostTerm.user)).filter(
+            CommitteePostTerm.post_id.in_(post_ids),
+            CommitteePostTerm.start_date <= now,
+            CommitteePostTerm.end_date >= now
+        )
+        for term in terms:
+            current_terms[term.post_id].append(term)
+
+    author_terms = None
+    if committee.page != None:
+        set_committed_value(committee.page, "committee", committee)
+        revision = committee.page.latest_published_revision()
+        if revision != None and revision.author != None:
+            author_terms = CommitteePostTerm.query.options(
+                joinedload(CommitteePostTerm.post).joinedload(CommitteePost.committee).joinedload(Committee.category)
+            ).filter(CommitteePostTerm.user_id == revision.author.id).all()
+
+    return committee.to_dict(current_terms, author_terms)
 
 class CommitteeResource(Resource):
+    @reads_from_replica
+    @conditional(Committee, CommitteeCategory, CommitteePost, CommitteePostTerm, User, Event, PostTag, Page, PageRevision,
+        validators=[latest_term_change])
     def get(self, id):
-        committee = Committee.query.get(id)
-        return jsonify(committee.to_dict())
+        return jsonify(committee_to_dict(id))
 
     @requires_auth
     def put(self, user):
@@ -37,14 +88,19 @@ class CommitteeResource(Resource):
         return jsonify({"message": "ok"})
 
 class CommitteeListResource(Resource):
+    @reads_from_replica
+    @conditional(Committee, Page)
+    @cached_response(Committee, Page)
     def get(self):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
-        committees = Committee.query.paginate(page=page, per_page=per_page)
-        data = [committee.to_basic_dict() for committee in committees.items]
-        return jsonify({"data": data, "totalCount": committees.total})
+        committees = paginate(Committee.query.options(joinedload(Committee.page)), page, per_page)
+        data = [cached_dict(committee, Committee.to_basic_dict) for committee in committees.items]
+        return jsonify(committees.to_dict(data))
 
 class CommitteePostListWithCommitteeResource(Resource):
+    @reads_from_replica
+    @conditional(CommitteePost, CommitteePostTerm, User, Committee, CommitteeCategory, validators=[latest_term_change])
     def get(self, id):
         posts = CommitteePost.query.filter_by(committee_id=id)
         data = [post.to_dict_with_all_terms() for post in posts]
@@ -1,12 +1,19 @@
 from flask import jsonify, request
 from flask_restful import Resource
-from api.db import db
+from api.db import db, reads_from_replica
 
-from api.models.committee_post import CommitteePost
+from api.models.committee import Committee, CommitteeCategory
+from api.models.committee_post import CommitteePost, CommitteePostTerm
+from api.models.user import User
 
 from api.resources.authentication import requires_auth
+from api.utility.versions import conditional
+from api.utility.pagination import paginate
+from api.utility.terms import latest_term_change
 
 class CommitteePostResource(Resource):
+    @reads_from_replica
+    @conditional(CommitteePost, CommitteePostTerm, User, Committee, CommitteeCategory, validators=[latest_term_change])
     def get(self, id):
         committee_post = CommitteePost.query.get(id)
         return jsonify(committee_post.to_dict())
@@ -38,12 +45,14 @@ class CommitteePostResource(Resource):
 
 
 class CommitteePostListResource(Resource):
+    @reads_from_replica
+    @conditional(CommitteePost, CommitteePostTerm, User, Committee, CommitteeCategory, validators=[latest_term_change])
     def get(self):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
-        committee_posts = CommitteePost.query.paginate(page=page, per_page=per_page)
+        committee_posts = paginate(CommitteePost.query, page, per_page)
         data = [committee_post.to_dict() for committee_post in committee_posts.items]
-        return jsonify({"data": data, "totalCount": committee_posts.total})
+        return jsonify(committee_posts.to_dict(data))
 
     def post(self):
         # Ny post
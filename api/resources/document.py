@@ -1,4 +1,4 @@
-from flask import jsonify, request
+from flask import jsonify, request, make_response
 from flask_restful import Resource, reqparse
 
 import sys
@@ -7,19 +7,46 @@ import json
 import os
 import base64
 from datetime import datetime
+from mimetypes import guess_extension
 
-from api.db import db
+from sqlalchemy.orm import selectinload
+
+from api.db import db, reads_from_replica
 from api.models.document import Document, Tag, DocumentTags
 
-from api.utility.storage import upload_b64_document
+from api.utility.storage import upload_document_file
+from api.utility.jobs import job, job_queue
+from api.utility.uploads import spool_upload, spool_b64
+from api.utility.versions import conditional, VersionedCache, CACHE_CHECK_INTERVAL
+from api.utility.pagination import paginate
 
 from api.resources.authentication import requires_auth
 
+# Taggarna är få och ändras sällan, så alla hålls serialiserade i minnet tills någon process ändrar dem
+tag_cache = VersionedCache(Tag, maxsize=1, check_interval=CACHE_CHECK_INTERVAL)
+
+def load_tags():
+    return {tag.tagId: tag.to_dict() for tag in Tag.query.all()}
+
+def tag_dicts(tag_ids=()):
+    """
+    returns a dict of tag id -> serialized tag, loading all tags in one query when
+    the cache is stale or is missing one of the given ids
+    """
+    tags = tag_cache.get_or_load("tags", load_tags)
+    if any(tag_id not in tags for tag_id in tag_ids):
+        # En tagg som nyss skapats i en annan process
+        tag_cache.pop("tags")
+        tags = tag_cache.get_or_load("tags", load_tags)
+    return tags
+
 
 class DocumentResource(Resource):
+    @reads_from_replica
+    @conditional(Document, Tag)
     def get(self, id):
         document = Document.query.get_or_404(id)
-        return jsonify(document.to_dict())
+        return jsonify(document.to_dict(tag_dicts(set(res.tagId for res in document.tags))))
 
     def put(self, id):
         pass
@@ -44,10 +71,19 @@ class DocumentListResource(Resource):
             "tags": [1, 2],
             "file": "Base64 encoded date of the file to upload"
         }
+
+        The same fields can be sent as multipart/form-data, with the file as a file part
+        and title and tags JSON encoded. Large files are then never held in memory.
     """
     @requires_auth
     def post(self, user):
-        data = request.json
+        if request.mimetype == "multipart/form-data":
+            data = dict(request.form.items())
+            for key in ("title", "tags"):
+                if data.get(key):
+                    data[key] = json.loads(data[key])
+        else:
+            data = request.json
 
         document = Document()
 
@@ -66,16 +102,35 @@ class DocumentListResource(Resource):
                 tag = DocumentTags.query.get_or_404(tag_id)
                 tags.append(tag)
             document.tags = tags
-        if data.get('file'):
-            file = data.get('file')
-            filename, thumbnail = upload_b64_document(file, document.title or str(uuid.uuid4()), document.date or datetime.now())
-            document.fileName = filename
-            document.thumbnail = thumbnail
+
+        upload = request.files.get('file')
+        path = None
+        if upload or data.get('file'):
+            # Filen sparas i jobbkön medan den läses, innan dokumentet sparas så att en trasig fil inte lämnar en tom rad
+            if upload:
+                path, sha256 = spool_upload(upload)
+                mimetype = upload.mimetype
+                ext = os.path.splitext(upload.filename or "")[1] or guess_extension(mimetype)
+            else:
+                try:
+                    path, sha256, mimetype = spool_b64(data.get('file'))
+                except ValueError:
+                    return make_response(jsonify(message="Invalid file, expected a base64 data url"), 400)
+                ext = guess_extension(mimetype)
 
         db.session.add(document)
         db.session.commit()
+
+        if path is not None:
+            # Miniatyren och uppladdningen görs av en jobbworker
+            job_id = process_document.enqueue_for(user, document.itemId, path, ext, mimetype)
+            response = make_response(jsonify({"success": True, "id": document.itemId, "jobId": job_id, "sha256": sha256}), 202)
+            response.headers["Location"] = "/jobs/" + job_id
+            return response
         return jsonify({"success": True, "id": document.itemId})
 
+    @reads_from_replica
+    @conditional(Document, Tag)
     def get(self):
         tags = request.args.get('tags')
         page = request.args.get('page', 1, type=int)
@@ -83,22 +138,44 @@ class DocumentListResource(Resource):
         if tags is not None:
             tags = tags.split(",")
 
+        query = Document.query.options(selectinload(Document.tags))
         if tags is not None:
-            q = Document.query.join(DocumentTags).join(Tag).filter(Tag.tagId.in_(tags)).paginate(page=page, per_page=per_page)
+            q = paginate(query.join(DocumentTags).join(Tag).filter(Tag.tagId.in_(tags)), page, per_page)
         else:
-            q = Document.query.paginate(page=page, per_page=per_page)
-        documents = [Document.to_dict(res) for res in q.items]
-        return jsonify({"data": documents, "totalCount": q.total})
+            q = paginate(query, page, per_page)
+        tag_lookup = tag_dicts(set(res.tagId for doc in q.items for res in doc.tags))
+        documents = [res.to_dict(tag_lookup) for res in q.items]
+        return jsonify(q.to_dict(documents))
+
+
+@job(max_attempts=3)
+def process_document(id, path, ext, mimetype):
+    """
+    creates the thumbnail of an uploaded document and uploads both
+    """
+    document = Document.query.get(id)
+    if document is None:
+        job_queue.unspool(path)
+        return None
+    document.fileName, document.thumbnail = upload_document_file(path, ext, mimetype,
+        document.title or str(uuid.uuid4()), document.date or datetime.now())
+    db.session.commit()
+    job_queue.unspool(path)
+    return {"id": id, "filename": document.fileName, "thumbnail": document.thumbnail}
 
 
 class DocumentTagResource(Resource):
+    @reads_from_replica
+    @conditional(Tag)
     def get(self, id):
         tag = Tag.query.get_or_404(id)
         return jsonify(tag.to_dict())
 
 class DocumentTagListResource(Resource):
+    @reads_from_replica
+    @conditional(Tag)
     def get(self):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
-        q = Tag.query.paginate(page=page, per_page=per_page)
-        return {"data": [res.to_dict() for res in q.items], "totalCount": q.total}
+        q = paginate(Tag.query, page, per_page)
+        return q.to_dict([res.to_dict() for res in q.items])
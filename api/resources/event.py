@@ -1,6 +1,7 @@
 from flask import jsonify, request, make_response
 from flask_restful import Resource
-from sqlalchemy import or_, and_
+from sqlalchemy import or_, and_, func
+from sqlalchemy.orm import joinedload
 from datetime import datetime
 import json
 import os
@@ -8,9 +9,16 @@ import os
 from api.function_library.image_functions import save_image
 from api.resources.authentication import requires_auth
 from api.utility.storage import upload_image
+from api.utility.permissions import can_edit
+from api.utility.fragments import cached_dict
+from api.utility.versions import conditional
+from api.utility.response_cache import cached_response
+from api.utility.pagination import keyset_page, paginate, InvalidCursor
 
-from api.db import db
+from api.db import db, reads_from_replica
 from api.models.event import Event
+from api.models.committee import Committee
+from api.models.page import Page
 from api.models.post_tag import PostTag
 
 from api.resources.common import parseBoolean
@@ -19,7 +27,21 @@ SAVE_FOLDER = os.path.join(os.getcwd(), "api", "static", "events")
 PATH = "static/events/"
 ISO_DATE_DEF = "%Y-%m-%dT%H:%M:%S.%fZ"
 
+def latest_publication():
+    """
+    the latest scheduled date that has passed, so cached listings change when a scheduled event is published
+    """
+    return db.session.query(func.max(Event.scheduled_date)).filter(Event.scheduled_date <= datetime.now()).scalar()
+
+def next_publication():
+    """
+    the next scheduled date among the events that aren't drafts, cached listings expire then
+    """
+    return db.session.query(func.min(Event.scheduled_date)).filter(Event.draft == False, Event.scheduled_date > datetime.now()).scalar()
+
 class EventResource(Resource):
+    @reads_from_replica
+    @conditional(Event, Committee, Page, PostTag, validators=[latest_publication])
     def get(self, id):
       """
       Get the event with the provided ID
@@ -35,8 +57,8 @@ class EventResource(Resource):
           200:
             description: OK
       """
-      event = Event.query.get(id)
-      return jsonify(event.to_dict())
+      event = Event.query.get_or_404(id)
+      return jsonify(event_to_dict(event))
     @requires_auth
     def delete(self, id, user):
       """
@@ -53,6 +75,9 @@ class EventResource(Resource):
         200:
           description: OK
       """
+      event = Event.query.get_or_404(id)
+      if not can_edit(user, owner_id=event.user_id, committee_id=event.committee_id):
+        return make_response(jsonify(success=False, error="Not allowed to delete this event"), 401)
       delete_event(id)
       return jsonify(message="event deleted!")
 
@@ -98,10 +123,16 @@ class EventResource(Resource):
             facebook_link:
               type: string
       """  
+      event = Event.query.get_or_404(id)
+      if not can_edit(user, owner_id=event.user_id, committee_id=event.committee_id):
+        return make_response(jsonify(success=False, error="Not allowed to edit this event"), 401)
       update_event(request, id)
       return jsonify(message="event updated!")
 
 class EventListResource(Resource):
+    @reads_from_replica
+    @conditional(Event, Committee, Page, PostTag, validators=[latest_publication])
+    @cached_response(Event, Committee, Page, PostTag, expires=next_publication)
     def get(self):
         """
         Get a list of all events
@@ -127,11 +158,18 @@ class EventListResource(Resource):
             type: string
           description:  ISO-8601 string
           example: 2020-02-09T14:44:44+0200
+        - name: cursor
+          in: query
+          schema:
+            type: string
+          description: Use cursor pagination instead of page. Empty for the first page, then the nextCursor of the previous page.
         produces:
           application/json
         responses:
           200:
             description: an array of event objects
+          400:
+            description: Invalid cursor
         """
         events = get_events()
         return events
@@ -201,6 +239,14 @@ class EventListResource(Resource):
 
 
 
+PAGINATION_PARAMS = ["page", "perPage", "cursor", "withCount"]
+
+# Utskottet och dess sida behövs för varje event, så de hämtas i samma fråga
+event_options = [joinedload(Event.committee).joinedload(Committee.page)]
+
+def event_to_dict(event):
+    return cached_dict(event, Event.to_dict, depends_on=(event.committee,))
+
 def get_events():
      #get query string params
     user_query = request.args.to_dict()
@@ -208,15 +254,31 @@ def get_events():
 
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('perPage', 20, type=int)
+    cursor = request.args.get('cursor')
+    for param in PAGINATION_PARAMS:
+        user_query.pop(param, None)
+
+    if cursor is not None:
+        if user_query:
+            query = Event.query.options(*event_options).filter_by(**user_query)
+        else:
+            scheduled_condition = [Event.scheduled_date <= datetime.now(), Event.scheduled_date == None]
+            query = Event.query.options(*event_options).filter(and_(Event.draft == False, or_(*scheduled_condition)))
+        try:
+            events, next_cursor, has_more = keyset_page(query, (Event.scheduled_date, Event.date, Event.id), cursor, per_page)
+        except InvalidCursor:
+            return make_response(jsonify(message="Invalid cursor"), 400)
+        return jsonify({"data": [event_to_dict(event) for event in events], "nextCursor": next_cursor, "hasMore": has_more})
 
     if user_query:
-        q = Event.query.filter_by(**user_query).paginate(page=page, per_page=per_page)
+        q = paginate(Event.query.options(*event_options).filter_by(**user_query), page, per_page)
     else:
         #if user did not provide filter, just send all events
         scheduled_condition = [Event.scheduled_date <= datetime.now(), Event.scheduled_date == None]
-        q = Event.query.filter(and_(Event.draft == False, or_(*scheduled_condition))).paginate(page=page, per_page=per_page)
-    data = [Event.to_dict(res) for res in q.items]
-    return jsonify({"data": data, "totalCount": q.total})
+        q = paginate(Event.query.options(*event_options).filter(and_(Event.draft == False, or_(*scheduled_condition))), page, per_page,
+            count_expires=next_publication)
+    data = [event_to_dict(res) for res in q.items]
+    return jsonify(q.to_dict(data))
 
 
 def add_event(request, user_id):
@@ -240,12 +302,12 @@ def add_event(request, user_id):
     return e
 
 def delete_event(id):
-    Event.query.filter(Event.eventId == id).delete()
+    Event.query.filter(Event.id == id).delete()
     db.session.commit()
 
 def update_event(request,id):
     params = request.json
-    e = Event.query.filter(Event.eventId == id).first()
+    e = Event.query.filter(Event.id == id).first()
     e.body = params["body"]
     e.body_en = params["body_en"]
     e.title = params["title"]
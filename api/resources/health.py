@@ -1,6 +1,28 @@
 from flask import jsonify
 from flask_restful import Resource
 
+from api.db import db
+from api.utility.pool import pool_stats
+
+import os
+
+# Lastbalanserare jämför svaret med "ok", poolen visas bara när det slås på
+POOL_STATS = os.getenv("HEALTH_POOL_STATS", "false").lower() == "true"
+
 class HealthResource(Resource):
     def get(self):
-        return jsonify("ok")
\ No newline at end of file
+        """
+        Returns ok, or ok together with the database connection pool of this worker process when HEALTH_POOL_STATS=true.
+        ---
+        tags:
+            - Health
+        responses:
+            200:
+                description: OK
+        """
+        if not POOL_STATS:
+            return jsonify("ok")
+        return jsonify({
+            "status": "ok",
+            "databasePool": pool_stats(db.engine)
+        })
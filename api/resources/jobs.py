@@ -0,0 +1,33 @@
+from flask import jsonify, make_response
+from flask_restful import Resource
+
+from api.resources.authentication import requires_auth
+from api.utility.jobs import job_queue
+
+class JobResource(Resource):
+    @requires_auth
+    def get(self, id, user):
+        """
+        Returns the status of a background job, e.g. a document or video upload.
+        Only the user who started the job and admins can see it.
+        ---
+        tags:
+            - Jobs
+        security:
+            - authenticated: []
+        parameters:
+        - name: id
+          in: path
+          schema:
+            type: string
+        responses:
+            200:
+                description: status is queued, running, succeeded or failed
+            404:
+                description: No such job
+        """
+        status = job_queue.get(id)
+        # Andras jobb ser ut att inte finnas, så att id:n inte går att pröva fram
+        if status is None or not (user.is_admin or status["userId"] == user.id):
+            return make_response(jsonify(message="No such job"), 404)
+        return jsonify(status)
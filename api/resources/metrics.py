@@ -0,0 +1,35 @@
+from flask import jsonify
+from flask_restful import Resource
+
+from api.resources.authentication import verified_tokens, principals
+from api.utility.permissions import memberships
+from api.utility.fragments import fragments
+from api.utility.response_cache import response_cache
+from api.utility.pagination import counts
+from api.utility.pool import pool_stats
+from api.utility.autocomplete import autocomplete
+from api.utility.jobs import job_queue
+from api.db import db
+
+class MetricsResource(Resource):
+    def get(self):
+        """
+        Returns internal cache counters for this worker process.
+        ---
+        tags:
+            - Health
+        responses:
+            200:
+                description: OK
+        """
+        return jsonify({
+            "tokenCache": verified_tokens.stats(),
+            "principalCache": principals.stats(),
+            "permissionCache": memberships.stats(),
+            "fragmentCache": fragments.stats(),
+            "responseCache": response_cache.stats(),
+            "countCache": counts.stats(),
+            "autocomplete": autocomplete.stats(),
+            "jobQueue": job_queue.stats(),
+            "databasePool": pool_stats(db.engine)
+        })
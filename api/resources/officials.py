@@ -1,14 +1,24 @@
 from flask import jsonify, request
 from flask_restful import Resource, reqparse
 from sqlalchemy import and_, or_, desc
+from sqlalchemy.orm import contains_eager, joinedload
 
+from api.db import db, reads_from_replica
 from api.models.user import User
 from api.models.committee import Committee, CommitteeCategory
 from api.models.committee_post import CommitteePost ,CommitteePostTerm
+from api.utility.fragments import cached_dict
+from api.utility.versions import conditional
+from api.utility.response_cache import cached_response
+from api.utility.pagination import paginate
+from api.utility.terms import latest_term_change, next_term_change
 
 from datetime import datetime
 
 class OfficialsResource(Resource):
+    @reads_from_replica
+    @conditional(CommitteePostTerm, CommitteePost, Committee, CommitteeCategory, User, validators=[latest_term_change])
+    @cached_response(CommitteePostTerm, CommitteePost, Committee, CommitteeCategory, User, expires=next_term_change)
     def get(self):
         """
         Gets officials with optional filters. If no filter is applied, all current officials are returned.
@@ -50,6 +60,11 @@ class OfficialsResource(Resource):
         date = args.atDate
 
         terms = []
+        # Posten, utskottet och kategorin finns redan i joinen, användaren hämtas i samma fråga
+        eager_options = [
+            contains_eager(CommitteePostTerm.post).contains_eager(CommitteePost.committee).contains_eager(Committee.category),
+            joinedload(CommitteePostTerm.user)
+        ]
 
         if args.forOperationalYear != None:
             years = args.forOperationalYear.split("/")
@@ -57,12 +72,12 @@ class OfficialsResource(Resource):
                 start_date_year = datetime(int(years[0]), 7, 1, 0, 0)
                 end_date_year = datetime(int(years[1]), 6, 30, 23, 59, 59)
 
-                terms = CommitteePostTerm.query.filter(CommitteePostTerm.post.has(CommitteePost.is_official == True)).filter(
+                terms = paginate(CommitteePostTerm.query.filter(CommitteePostTerm.post.has(CommitteePost.is_official == True)).filter(
                 or_(
                     and_(CommitteePostTerm.start_date >= start_date_year, CommitteePostTerm.start_date <= end_date_year),
                     and_(CommitteePostTerm.end_date >= start_date_year, CommitteePostTerm.end_date <= end_date_year),
                     and_(CommitteePostTerm.start_date <= start_date_year, CommitteePostTerm.end_date >= end_date_year)
-                )).join(CommitteePost).join(Committee).join(CommitteeCategory).order_by(desc(CommitteeCategory.weight), desc(CommitteePost.weight)).paginate(page=page, per_page=per_page)
+                )).join(CommitteePost).join(Committee).join(CommitteeCategory).options(*eager_options).order_by(desc(CommitteeCategory.weight), desc(CommitteePost.weight)), page, per_page)
             else:
                 return jsonify({"message": "Invalid input"})
         else:
@@ -70,14 +85,15 @@ class OfficialsResource(Resource):
                 date = datetime.now()
 
 
-            terms = CommitteePostTerm.query.filter(CommitteePostTerm.post.has(CommitteePost.is_official == True)).filter(and_(CommitteePostTerm.start_date <= date, CommitteePostTerm.end_date >= date)).join(CommitteePost).join(Committee).join(CommitteeCategory).order_by(desc(CommitteeCategory.weight), desc(CommitteePost.weight)).paginate(page=page, per_page=per_page)
+            terms = paginate(CommitteePostTerm.query.filter(CommitteePostTerm.post.has(CommitteePost.is_official == True)).filter(and_(CommitteePostTerm.start_date <= date, CommitteePostTerm.end_date >= date)).join(CommitteePost).join(Committee).join(CommitteeCategory).options(*eager_options).order_by(desc(CommitteeCategory.weight), desc(CommitteePost.weight)), page, per_page)
         data = []
         for term in terms.items:
             data.append({
                 "startDate": term.start_date,
                 "endDate": term.end_date,
-                "post": term.post.to_dict_without_terms(hyphenate=(True if args.hyphenate != None else False)),
+                "post": cached_dict(term.post, CommitteePost.to_dict_without_terms, args.hyphenate != None,
+                    depends_on=(term.post.committee, term.post.committee.category if term.post.committee else None)),
                 "user": term.user.to_dict_without_terms()
             })
 
-        return jsonify({"data": data, "totalCount": terms.total})
+        return jsonify(terms.to_dict(data))
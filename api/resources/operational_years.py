@@ -2,11 +2,17 @@ from flask import jsonify
 from flask_restful import Resource, reqparse
 
 from api.models.committee_post import CommitteePostTerm
+from api.utility.versions import conditional
+from api.db import reads_from_replica
+from api.utility.response_cache import cached_response
 
 from datetime import datetime
 from datetime import date
 
 class OperationalYearsResource(Resource):
+    @reads_from_replica
+    @conditional(CommitteePostTerm, validators=[date.today])
+    @cached_response(CommitteePostTerm)
     def get(self):
         """
         Gets current and available operational years.
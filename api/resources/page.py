@@ -1,14 +1,29 @@
-from api.db import db
+from api.db import db, reads_from_replica
 
 from flask import jsonify, request
 from flask_restful import Resource
 
 from api.models.page import Page, PageRevision, PageRevisionType
+from api.models.committee import Committee, CommitteeCategory
+from api.models.committee_post import CommitteePost, CommitteePostTerm
+from api.models.event import Event
+from api.models.post_tag import PostTag
+from api.models.user import User
 from api.resources.authentication import requires_auth
+from api.utility.versions import conditional
+from api.utility.response_cache import cached_response
+from api.utility.pagination import paginate
+from api.utility.terms import latest_term_change, next_term_change
 
 from slugify import slugify
 
+# En sida visar sin kommitté med poster, funktionärer och event
+page_models = (Page, PageRevision, User, Committee, CommitteeCategory, CommitteePost, CommitteePostTerm, Event, PostTag)
+
 class PageResource(Resource):
+    @reads_from_replica
+    @conditional(*page_models, validators=[latest_term_change])
+    @cached_response(*page_models, expires=next_term_change)
     def get(self, id):
         if id.isnumeric():
             page = Page.query.get(id)
@@ -125,6 +140,8 @@ class PageResource(Resource):
 
 
 class PageListResource(Resource):
+    @reads_from_replica
+    @conditional(*page_models, validators=[latest_term_change])
     def get(self):
         """
         Returns a list of all pages.
@@ -137,9 +154,9 @@ class PageListResource(Resource):
         """
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
-        pages = Page.query.paginate(page=page, per_page=per_page)
+        pages = paginate(Page.query, page, per_page)
         data = [page.to_dict() for page in pages.items]
-        return jsonify({"data": data, "totalCount": pages.total})
+        return jsonify(pages.to_dict(data))
 
     @requires_auth
     def post(self, user):
@@ -1,10 +1,10 @@
 from flask import jsonify, session, request, make_response
 from flask_restful import Resource
-from sqlalchemy import or_, and_, cast
+from sqlalchemy import or_, and_, cast, func
 from datetime import datetime
 import json
 
-from api.db import db
+from api.db import db, reads_from_replica
 
 from sqlalchemy import and_, exc
 from api.models.post import Post
@@ -13,6 +13,12 @@ from api.models.user import User
 from api.models.committee import Committee
 from api.resources.authentication import requires_auth
 from api.utility.storage import upload_b64_image
+from api.utility.images import queue_derivatives
+from api.utility.permissions import can_edit
+from api.utility.fragments import cached_dict
+from api.utility.versions import conditional
+from api.utility.response_cache import cached_response
+from api.utility.pagination import keyset_page, paginate, InvalidCursor
 
 import os
 from werkzeug.utils import secure_filename
@@ -26,7 +32,21 @@ IMAGE_PATH = "static/posts/"
 IMAGE_COL = "header_image"
 ISO_DATE_DEF = "%Y-%m-%dT%H:%M:%S.%fZ"
 
+def latest_publication():
+    """
+    the latest scheduled date that has passed, so cached listings change when a scheduled post is published
+    """
+    return db.session.query(func.max(Post.scheduled_date)).filter(Post.scheduled_date <= datetime.now()).scalar()
+
+def next_publication():
+    """
+    the next scheduled date among the posts that aren't drafts, cached listings expire then
+    """
+    return db.session.query(func.min(Post.scheduled_date)).filter(Post.draft == False, Post.scheduled_date > datetime.now()).scalar()
+
 class PostResource(Resource):
+    @reads_from_replica
+    @conditional(Post, validators=[latest_publication])
     def get(self, id):
         """
         Returns a post by id.
@@ -43,7 +63,7 @@ class PostResource(Resource):
                 description: OK
         """   
         post = Post.query.get_or_404(id)
-        return jsonify(post.to_dict())
+        return jsonify(cached_dict(post, Post.to_dict))
 
     @requires_auth
     def put(self, id, user):
@@ -97,16 +117,9 @@ class PostResource(Resource):
                 description: Did not find post with id
         """
         post = Post.query.get_or_404(id)
-        post_user = (user.id == post.user_id)
-
-        committee_member = False
-        if(not post_user): 
-            for post_term in user.post_terms:
-                if((post_term.post.committee_id == post.committee_id) and (post_term.start_date < datetime.today() < post_term.end_date)):
-                    committee_member = True
         data = request.json
 
-        if user.is_admin or post_user or committee_member:
+        if can_edit(user, owner_id=post.user_id, committee_id=post.committee_id):
             if data.get("title"):
               title = data.get("title")
               if title.get('se'):
@@ -127,59 +140,81 @@ class PostResource(Resource):
               post.draft = data.get('draft')
             if data.get('header_image'):
               post.header_image = upload_b64_image(data.get('header_image'))
+              post.header_image_derivatives = None
             if data.get('committee_id'):
               post.committee_id = data.get('committee_id')
             if data.get('tags'):
               post.tags = data.get('tags')
             
             db.session.commit()
+            if data.get('header_image'):
+              queue_derivatives("post", post.id, post.header_image, data.get('header_image'))
             return make_response(jsonify(success=True))
         else:
-            return make_response(jsonify(success=False, error=str(error)), 401)
+            return make_response(jsonify(success=False, error="Not allowed to edit this post"), 401)
     
     @requires_auth
     def delete(self, id, user):
         post = Post.query.get_or_404(id)
+        if not can_edit(user, owner_id=post.user_id, committee_id=post.committee_id):
+            return make_response(jsonify(success=False, error="Not allowed to delete this post"), 401)
         db.session.delete(post)
         db.session.commit()
         return jsonify({"message": "ok"})
         
 class PostListResource(Resource): 
+    @reads_from_replica
+    @conditional(Post, validators=[latest_publication])
+    @cached_response(Post, expires=next_publication)
     def get(self):
         """
         Returns a list of all posts.
         ---
         tags:
             - Posts
+        parameters:
+        - name: cursor
+          in: query
+          description: Use cursor pagination instead of page. Empty for the first page, then the nextCursor of the previous page.
+          schema:
+            type: string
         responses:
             200:
                 description: OK
+            400:
+                description: Invalid cursor
         """
         show_unpublished = request.args.get('showUnpublished', False, type=bool)
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
+        cursor = request.args.get('cursor')
 
-        data = []
-        total_count = 0
+        if cursor is not None:
+          query = Post.query
+          if not show_unpublished:
+            query = query.filter(Post.draft == False, or_(Post.scheduled_date <= datetime.now(), Post.scheduled_date == None))
+          try:
+            posts, next_cursor, has_more = keyset_page(query, (Post.scheduled_date, Post.date, Post.id), cursor, per_page)
+          except InvalidCursor:
+            return make_response(jsonify(message="Invalid cursor"), 400)
+          data = [cached_dict(post, Post.to_dict) for post in posts]
+          return jsonify({"data": data, "nextCursor": next_cursor, "hasMore": has_more})
 
         ## TODO: Only show unpublished if logged in
         if show_unpublished:
-          posts = Post.query.order_by(Post.date.desc()).paginate(page=page, per_page=per_page)
-          data = [post.to_dict() for post in posts.items]
-          total_count = posts.total
+          posts = paginate(Post.query.order_by(Post.date.desc()), page, per_page)
         else:
           scheduled_condition = [Post.scheduled_date <= datetime.now(), Post.scheduled_date == None]
-          posts = Post.query.filter(
+          posts = paginate(Post.query.filter(
             and_(
               Post.draft == False,
               or_(*scheduled_condition)
             )).order_by(
               Post.scheduled_date.desc(),
               Post.date.desc()
-            ).paginate(page=page, per_page=per_page)
-          data = [post.to_dict() for post in posts.items]
-          total_count = posts.total
-        return jsonify({"data": data, "totalCount": total_count})
+            ), page, per_page, count_expires=next_publication)
+        data = [cached_dict(post, Post.to_dict) for post in posts.items]
+        return jsonify(posts.to_dict(data))
     
     @requires_auth
     def post(self, user):
@@ -256,6 +291,7 @@ class PostListResource(Resource):
               post.draft = data.get('draft')
             if data.get('header_image'):
               post.header_image = upload_b64_image(data.get('header_image'))
+              post.header_image_derivatives = None
             if data.get('committee_id'):
               post.committee_id = data.get('committee_id')
             if data.get('tags'):
@@ -263,6 +299,8 @@ class PostListResource(Resource):
 
             db.session.add(post)
             db.session.commit()
+            if data.get('header_image'):
+              queue_derivatives("post", post.id, post.header_image, data.get('header_image'))
             return make_response(jsonify(success=True, id=post.id))
         else:
             return make_response(jsonify(success=False, error=str(error)), 403)
@@ -1,12 +1,16 @@
 from flask import jsonify, session, request, make_response
 from flask_restful import Resource
 
-from api.db import db
+from api.db import db, reads_from_replica
 from api.models.post_tag import PostTag
 
 from api.resources.authentication import requires_auth
+from api.utility.versions import conditional
+from api.utility.pagination import paginate
 
 class PostTagResource(Resource):
+    @reads_from_replica
+    @conditional(PostTag)
     def get(self, id):
         """
         Returns a post tag by id.
@@ -96,6 +100,8 @@ class PostTagAddResource(Resource):
             return make_response(jsonify(success=False, error=str(error)), 403)
         
 class PostTagListResource(Resource):
+    @reads_from_replica
+    @conditional(PostTag)
     def get(self):
         """
         Returns a list of all post tags.
@@ -110,7 +116,6 @@ class PostTagListResource(Resource):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
 
-        tags = PostTag.query.paginate(page=page, per_page=per_page)
+        tags = paginate(PostTag.query, page, per_page)
         data = [tag.to_dict() for tag in tags.items]
-        total_count = tags.total
-        return jsonify({"data": data, "totalCount": total_count})
+        return jsonify(tags.to_dict(data))
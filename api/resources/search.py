@@ -1,28 +1,41 @@
-from flask import jsonify
+from flask import jsonify, request
 from flask_restful import Resource
 
-from sqlalchemy import or_
-
+from api.db import db, reads_from_replica
 from api.models.user import User
 from api.models.document import Document
 from api.models.committee import Committee
 from api.models.committee_post import CommitteePost
+from api.models.post import Post
+from api.models.event import Event
+from api.models.page import Page, PageRevision
+from api.resources.post import latest_publication as latest_post_publication
+from api.resources.event import latest_publication as latest_event_publication
+from api.utility import search_index
+from api.utility.versions import conditional
 
 class SearchResource(Resource):
+    @reads_from_replica
+    @conditional(User, Committee, CommitteePost, Document, Post, Event, Page, PageRevision,
+        validators=[latest_post_publication, latest_event_publication])
     def get(self, search_term):
-        search_str = "%"+search_term+"%"
-        user_conds = [User.kth_id.ilike(search_str), User.email.ilike(search_str), User.first_name.ilike(search_str), 
-                    User.last_name.ilike(search_str), User.frack_name.ilike(search_str)]
-        com_conds = [Committee.name.ilike(search_str)]
-        post_conds = [CommitteePost.name.ilike(search_str)]
-        doc_conds = [Document.title.ilike(search_str)]
-
-        users = User.query.filter(or_(*user_conds)).all()
-        committees = Committee.query.filter(or_(*com_conds)).all()
-        posts = CommitteePost.query.filter(or_(*post_conds)).all()
-        docs = Document.query.filter(or_(*doc_conds)).all()
-
-        data = {"users": [user.to_dict() for user in users], "commitees": [committee.to_dict() for committee in committees],
-            "posts": [post.to_dict() for post in posts], "documents": [doc.to_dict() for doc in docs]}
-        
-        return jsonify(data)
\ No newline at end of file
+        """
+        Returns the best matches for every word in search_term, users, committees, committee posts,
+        documents, news posts, events and pages ranked together. The last word may be the start of a word.
+        ---
+        tags:
+            - Search
+        parameters:
+            - name: page
+              in: query
+              schema:
+                type: integer
+            - name: perPage
+              in: query
+              schema:
+                type: integer
+        """
+        page = max(request.args.get('page', 1, type=int), 1)
+        per_page = min(max(request.args.get('perPage', 20, type=int), 1), 100)
+        results, has_more = search_index.search(db.session, search_term, page, per_page)
+        return jsonify({"data": results, "hasMore": has_more})
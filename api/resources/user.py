@@ -1,15 +1,41 @@
-from flask import jsonify, request, session
+from flask import jsonify, request, session, redirect
 from flask_restful import Resource
 
-from api.db import db
+from sqlalchemy.orm import joinedload
+
+from api.db import db, reads_from_replica
 from api.resources.authentication import requires_auth
 from api.models.user import User
+from api.models.committee import Committee, CommitteeCategory
+from api.models.committee_post import CommitteePost, CommitteePostTerm
+from api.utility.versions import conditional
+from api.utility.pagination import paginate
 from api.utility.storage import upload_profile_picture
+from api.utility.images import queue_derivatives
+
+from collections import defaultdict
+
+def users_to_dict(users):
+    """
+    serializes a list of users with all their terms, loading the terms together
+    with their posts, committees and categories in one query
+    """
+    terms = defaultdict(list)
+    user_ids = [user.id for user in users]
+    if user_ids:
+        query = CommitteePostTerm.query.options(
+            joinedload(CommitteePostTerm.post).joinedload(CommitteePost.committee).joinedload(Committee.category)
+        ).filter(CommitteePostTerm.user_id.in_(user_ids)).order_by(CommitteePostTerm.id)
+        for term in query:
+            terms[term.user_id].append(term)
+    return [user.to_dict(terms[user.id]) for user in users]
 
 class UserResource(Resource):
+    @reads_from_replica
+    @conditional(User, CommitteePostTerm, CommitteePost, Committee, CommitteeCategory)
     def get(self, id):
-        user = User.query.get(id)
-        return jsonify(user.to_dict())
+        user = User.query.get_or_404(id)
+        return jsonify(users_to_dict([user])[0])
 
     @requires_auth
     def put(self, id, user):
@@ -32,34 +58,30 @@ class UserResource(Resource):
             if data.get("facebook"):
                 userData.facebook = data.get("facebook")
 
-            if "profile_picture" in request.files:
-                image = request.files["profile_picture"]
+            image = request.files.get("profile_picture")
+            if image:
                 try:
                     userData.profile_picture = upload_profile_picture(image)
                 except ValueError:
                     return jsonify(success=False), 415
+                userData.profile_picture_derivatives = None
             db.session.commit()
+            if image:
+                queue_derivatives("user", userData.id, userData.profile_picture, image)
 
             if data.get("redirect"):
                 return redirect(data.get("redirect"))
 
-            return jsonify(success=True, local_path=local_path)
+            return jsonify(success=True, profilePicture=userData.profile_picture)
         else:
             return jsonify(success=False), 403
 
 class UserListResource(Resource):
+    @reads_from_replica
+    @conditional(User, CommitteePostTerm, CommitteePost, Committee, CommitteeCategory)
     def get(self):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
-        users = User.query.paginate(page=page, per_page=per_page)
-        data = [user.to_dict() for user in users.items]
-        return jsonify({"data": data, "totalCount": users.total})
-
-def resize_image(file_path, filename):
-    im = Image.open(file_path)
-    size = (512, 512) # thumbnail-storleken
-    filename = filename.split(".")[0]
-    outfile = os.path.splitext(im.filename)[0]
-    im.thumbnail(size)
-    im.save(outfile +".jpg")
-    return outfile + ".jpg"
\ No newline at end of file
+        users = paginate(User.query, page, per_page)
+        data = users_to_dict(users.items)
+        return jsonify(users.to_dict(data))
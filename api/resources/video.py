@@ -4,8 +4,11 @@ import requests
 import os
 
 from api.models.video import Video
-from api.db import db
+from api.db import db, reads_from_replica
 from api.resources.authentication import requires_auth
+from api.utility.versions import conditional
+from api.utility.pagination import paginate
+from api.utility.jobs import job, job_queue, RetryLater
 
 TOKEN_ID = os.getenv("MUX_TOKEN_ID")
 SECRET = os.getenv("MUX_SECRET")
@@ -23,57 +26,74 @@ class VideoListResource(Resource):
         
         file = request.files['video']
 
-        url = "https://api.mux.com/video/v1/uploads"
-
-        data = {
-            "new_asset_settings": { "playback_policy": ["public"] }
-        }
-
-        r = requests.post(url, json=data, auth=(TOKEN_ID, SECRET))
-        if not r.ok:
-            return r.text, r.status_code
-        
-        upload_id = r.json()["data"]["id"]
-        url = r.json()["data"]["url"]
-        r = requests.put(url, data=file.read()) # Låt klienten göra detta kanske?
-
-        url = "https://api.mux.com/video/v1/uploads/" + upload_id
-        r = requests.get(url, auth=(TOKEN_ID, SECRET))
-
-        if not r.ok:
-            return r.text, r.status_code
-        
-        asset_id = r.json()["data"]["asset_id"]
-
-        url = "https://api.mux.com/video/v1/assets/" + asset_id
-        r = requests.get(url, auth=(TOKEN_ID, SECRET))
-
-        playback_id = r.json()["data"]["playback_ids"][0]["id"]
-
-        if not r.ok:
-            return r.text, r.status_code
-
+        # Videon skickas till Mux av en jobbworker, den får en playback id när Mux har bearbetat den
         video = Video()
-        video.mux_asset_id = asset_id
-        video.mux_playback_id = playback_id
         video.title = video_title
         video.requires_login = False
 
         db.session.add(video)
         db.session.commit()
 
-        return make_response(jsonify(success=True, id=video.id, data=video.to_dict()))
+        job_id = upload_video.enqueue_for(user, video.id, job_queue.spool(file.stream))
+        response = make_response(jsonify(success=True, id=video.id, jobId=job_id, data=video.to_dict()), 202)
+        response.headers["Location"] = "/jobs/" + job_id
+        return response
 
+    @reads_from_replica
+    @conditional(Video)
     def get(self):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('perPage', 20, type=int)
-        videos = Video.query.paginate(page=page, per_page=per_page)
+        videos = paginate(Video.query, page, per_page)
         data = [video.to_dict() for video in videos.items]
-        return jsonify({"data": data, "totalCount": videos.total})
+        return jsonify(videos.to_dict(data))
 
         
 
+@job(max_attempts=3)
+def upload_video(id, path):
+    """
+    uploads a video file to Mux and starts polling for the asset
+    """
+    r = requests.post("https://api.mux.com/video/v1/uploads", json={
+        "new_asset_settings": { "playback_policy": ["public"] }
+    }, auth=(TOKEN_ID, SECRET))
+    r.raise_for_status()
+
+    upload_id = r.json()["data"]["id"]
+    with open(path, "rb") as source:
+        requests.put(r.json()["data"]["url"], data=source).raise_for_status()
+    job_queue.unspool(path)
+    return {"uploadId": upload_id, "pollJobId": poll_video.enqueue(id, upload_id)}
+
+@job(max_attempts=60)
+def poll_video(id, upload_id):
+    """
+    saves the asset and playback id of an uploaded video once Mux has created them
+    """
+    r = requests.get("https://api.mux.com/video/v1/uploads/" + upload_id, auth=(TOKEN_ID, SECRET))
+    r.raise_for_status()
+    asset_id = r.json()["data"].get("asset_id")
+    if not asset_id:
+        raise RetryLater(10, "Waiting for the Mux asset")
+
+    r = requests.get("https://api.mux.com/video/v1/assets/" + asset_id, auth=(TOKEN_ID, SECRET))
+    r.raise_for_status()
+    playback_ids = r.json()["data"].get("playback_ids")
+    if not playback_ids:
+        raise RetryLater(10, "Waiting for the Mux playback id")
+
+    video = Video.query.get(id)
+    if video is None:
+        return None
+    video.mux_asset_id = asset_id
+    video.mux_playback_id = playback_ids[0]["id"]
+    db.session.commit()
+    return {"assetId": asset_id, "playbackId": video.mux_playback_id}
+
 class VideoResource(Resource):
+    @reads_from_replica
+    @conditional(Video)
     def get(self, id):
         video = Video.query.get_or_404(id)
         return jsonify(video.to_dict())
@@ -84,11 +104,12 @@ class VideoResource(Resource):
     @requires_auth
     def delete(self, id, user):
         video = Video.query.get_or_404(id)
-        url = "https://api.mux.com/video/v1/assets/" + video.mux_asset_id
-        r = requests.delete(url, auth=(TOKEN_ID, SECRET))
+        if video.mux_asset_id:
+            url = "https://api.mux.com/video/v1/assets/" + video.mux_asset_id
+            r = requests.delete(url, auth=(TOKEN_ID, SECRET))
 
-        if not r.ok:
-            return r.text, r.status_code
+            if not r.ok:
+                return r.text, r.status_code
         
         db.session.delete(video)
         db.session.commit()
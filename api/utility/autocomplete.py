@@ -0,0 +1,288 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from api.models.user import User
+from api.models.committee import Committee
+from api.models.committee_post import CommitteePost
+from api.models.document import Document
+from api.models.table_version import TableVersion
+from api.utility.changes import table_name
+
+from collections import Counter
+import os
+import threading
+import time
+import unicodedata
+
+# Så många förslag sparas i varje nod, och är alltså det största antalet ett anrop kan få
+TOP_K = 10
+SYNC_INTERVAL = float(os.getenv("AUTOCOMPLETE_SYNC_INTERVAL", 5))
+
+
+def normalize(text):
+    """
+    lower case without accents, so "ordf" finds "Ordförande" and "Ordforande"
+    """
+    decomposed = unicodedata.normalize("NFKD", text)
+    return "".join(c for c in decomposed if not unicodedata.combining(c)).casefold()
+
+
+def user_entry(user):
+    name = " ".join(part for part in (user.first_name, user.last_name) if part)
+    return name, [name, user.frack_name, user.kth_id]
+
+
+def committee_entry(committee):
+    return committee.name, [committee.name]
+
+
+def committee_post_entry(post):
+    return post.name, [post.name]
+
+
+def document_entry(document):
+    return document.title, [document.title, document.title_en]
+
+
+# Modell -> (typ, prioritet bland förslagen, funktion som ger förslagets text och allt det ska hittas på)
+SOURCES = {
+    Committee: ("committee", 0, committee_entry),
+    CommitteePost: ("committee_post", 1, committee_post_entry),
+    User: ("user", 2, user_entry),
+    Document: ("document", 3, document_entry),
+}
+TABLES = sorted(table_name(model) for model in SOURCES)
+
+
+def key_for(instance):
+    return (SOURCES[type(instance)][0], inspect(instance).mapper.primary_key_from_instance(instance)[0])
+
+
+def entry_for(instance):
+    """
+    @returns (key, entry): entry is None when the row shouldn't be suggested
+    """
+    _, priority, source = SOURCES[type(instance)]
+    key = key_for(instance)
+    label, phrases = source(instance)
+    if not label:
+        return key, None
+    terms = set()
+    for phrase in phrases:
+        words = normalize(phrase or "").split()
+        # Varje ord i frasen är en egen startpunkt, så "and" hittar "Amanda Andrén"
+        terms.update(" ".join(words[i:]) for i in range(len(words)))
+    rank = (priority, len(label), label.casefold(), key)
+    return key, (label, frozenset(terms), rank)
+
+
+class Node:
+    __slots__ = ("children", "keys", "top")
+
+    def __init__(self):
+        self.children = {}
+        self.keys = set()
+        self.top = []
+
+
+class PrefixIndex:
+    """
+    trie over the normalized terms of every entry. Each node keeps the TOP_K best entries
+    below it, so a lookup is a walk down the prefix and a slice, independent of how many
+    entries match. Inserts and removals update the lists along the changed path.
+    """
+
+    def __init__(self):
+        self.root = Node()
+        self.entries = {}
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rank(self, key):
+        return self.entries[key][2]
+
+    def best(self, keys):
+        return sorted(set(keys), key=self.rank)[:TOP_K]
+
+    def path(self, term, create=False):
+        nodes = [self.root]
+        for char in term:
+            node = nodes[-1].children.get(char)
+            if node is None:
+                if not create:
+                    return None
+                node = nodes[-1].children[char] = Node()
+            nodes.append(node)
+        return nodes
+
+    def add(self, key, entry):
+        self.remove(key)
+        self.entries[key] = entry
+        rank = entry[2]
+        for term in entry[1]:
+            nodes = self.path(term, create=True)
+            nodes[-1].keys.add(key)
+            for node in nodes:
+                if key not in node.top and (len(node.top) < TOP_K or rank < self.rank(node.top[-1])):
+                    node.top = self.best(node.top + [key])
+
+    def remove(self, key):
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        for term in entry[1]:
+            nodes = self.path(term)
+            if nodes is None:
+                continue
+            nodes[-1].keys.discard(key)
+            for depth in range(len(nodes) - 1, -1, -1):
+                node = nodes[depth]
+                if key in node.top:
+                    # Noden kan ha fler träffar än den sparade, så listan byggs om från barnen
+                    candidates = [k for k in node.keys if k != key]
+                    for child in node.children.values():
+                        candidates.extend(k for k in child.top if k != key)
+                    node.top = self.best(candidates)
+                if depth > 0 and not node.keys and not node.children:
+                    del nodes[depth - 1].children[term[depth - 1]]
+        del self.entries[key]
+
+    def complete(self, prefix, limit):
+        nodes = self.path(" ".join(normalize(prefix).split()))
+        if nodes is None:
+            return []
+        return [(key, self.entries[key][0]) for key in nodes[-1].top[:limit]]
+
+
+class Autocomplete:
+    """
+    the prefix index of this worker process. Writes committed by this process are applied
+    directly. Writes from other processes are noticed through table_version, checked at most
+    every SYNC_INTERVAL seconds, and make the index rebuild from the database.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.index = None
+        self.versions = {}
+        self.checked_at = 0
+        self.builds = 0
+        self.build_time = 0.0
+
+    def database_versions(self, session):
+        return dict(session.query(TableVersion.name, TableVersion.version).filter(TableVersion.name.in_(TABLES)))
+
+    def rebuild(self, session):
+        start = time.perf_counter()
+        versions = self.database_versions(session)
+        index = PrefixIndex()
+        for model in SOURCES:
+            for instance in session.query(model).yield_per(500):
+                key, entry = entry_for(instance)
+                if entry is not None:
+                    index.add(key, entry)
+        with self.lock:
+            self.index, self.versions = index, versions
+            self.builds += 1
+            self.build_time = time.perf_counter() - start
+
+    def sync(self, session):
+        # En tråd i taget kontrollerar och bygger om. Finns det ett index använder de andra det under tiden,
+        # annars väntar de på det som byggs.
+        if not self.sync_lock.acquire(blocking=self.index is None):
+            return
+        try:
+            now = time.time()
+            if self.index is not None and now - self.checked_at < SYNC_INTERVAL:
+                return
+            self.checked_at = now
+            if self.index is None:
+                self.rebuild(session)
+                return
+            versions = self.database_versions(session)
+            # En replika som ligger efter har lägre versioner, bara nyare skrivningar ger en ombyggnad
+            if any(version > self.versions.get(name, 0) for name, version in versions.items()):
+                self.rebuild(session)
+        finally:
+            self.sync_lock.release()
+
+    def apply(self, changes, bumps):
+        with self.lock:
+            if self.index is None:
+                return
+            for key, entry in changes:
+                if entry is None:
+                    self.index.remove(key)
+                else:
+                    self.index.add(key, entry)
+            for name, count in bumps.items():
+                self.versions[name] = self.versions.get(name, 0) + count
+
+    def complete(self, session, prefix, limit):
+        self.sync(session)
+        with self.lock:
+            if self.index is None:
+                return []
+            return [{"type": kind, "id": id, "label": label} for (kind, id), label in self.index.complete(prefix, limit)]
+
+    def invalidate(self):
+        with self.lock:
+            self.index = None
+
+    def stats(self):
+        return {
+            "entries": len(self.index) if self.index is not None else 0,
+            "builds": self.builds,
+            "lastBuildMs": round(self.build_time * 1000, 3)
+        }
+
+
+autocomplete = Autocomplete()
+
+
+def pending(session):
+    return session.info.setdefault("autocomplete", ([], Counter()))
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    changes, bumps = pending(session)
+    tables = set()
+    for instance in session.new:
+        if type(instance) in SOURCES:
+            changes.append(entry_for(instance))
+            tables.add(table_name(type(instance)))
+    for instance in session.dirty:
+        if type(instance) in SOURCES and session.is_modified(instance):
+            changes.append(entry_for(instance))
+            tables.add(table_name(type(instance)))
+    for instance in session.deleted:
+        if type(instance) in SOURCES:
+            changes.append((key_for(instance), None))
+            tables.add(table_name(type(instance)))
+    # table_version räknas upp en gång per tabell och flush, samma sak räknas här
+    bumps.update(tables)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _collect_bulk(context):
+    if context.primary_table.name in TABLES:
+        # Vilka rader som ändrades går inte att veta, indexet byggs om vid nästa anrop
+        pending(context.session)[1]["rebuild"] += 1
+
+
+@event.listens_for(Session, "after_commit")
+def _apply(session):
+    changes, bumps = session.info.pop("autocomplete", ([], Counter()))
+    if bumps.pop("rebuild", None):
+        autocomplete.invalidate()
+    elif changes:
+        autocomplete.apply(changes, bumps)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("autocomplete", None)
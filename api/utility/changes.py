@@ -0,0 +1,62 @@
+from sqlalchemy import event, func, inspect
+from sqlalchemy.orm import Session
+
+import itertools
+
+_subscribers = []
+
+
+def table_name(model):
+    return inspect(model).local_table.name
+
+
+def on_commit(callback, *models):
+    """
+    register a callback that runs after every commit that wrote to one of the given models
+    @param callback: called with the set of table names written in the transaction
+    @param models: the models to listen for, all models if none are given
+    """
+    tables = set(table_name(model) for model in models)
+    _subscribers.append((callback, tables))
+    return callback
+
+
+def touched_tables(session):
+    return session.info.setdefault("touched_tables", set())
+
+
+@event.listens_for(Session, "before_flush")
+def _bump_versions(session, flush_context, instances):
+    # Modeller med en version-kolumn får den uppräknad vid varje ändring, även av relationer.
+    # Uppräkningen görs i databasen så att två samtidiga skrivningar inte får samma version.
+    for instance in session.dirty:
+        if hasattr(type(instance), "version") and session.is_modified(instance):
+            instance.version = func.coalesce(type(instance).version, 0) + 1
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_flushed(session, flush_context):
+    touched = touched_tables(session)
+    for instance in itertools.chain(session.new, session.dirty, session.deleted):
+        touched.add(inspect(instance).mapper.local_table.name)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _collect_bulk(context):
+    touched_tables(context.session).add(context.primary_table.name)
+
+
+@event.listens_for(Session, "after_commit")
+def _notify(session):
+    touched = session.info.pop("touched_tables", None)
+    if not touched:
+        return
+    for callback, tables in _subscribers:
+        if not tables or tables & touched:
+            callback(touched)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("touched_tables", None)
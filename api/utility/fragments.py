@@ -0,0 +1,33 @@
+from sqlalchemy import inspect
+
+from api.models.committee import CommitteeCategory
+from api.models.page import Page
+from api.models.post_tag import PostTag
+from api.utility.versions import VersionedCache, CACHE_CHECK_INTERVAL
+
+import os
+
+# Serialiserade rader, nyckeln innehåller radens version så att ändrade rader aldrig hittas.
+# Fragmenten innehåller också data från de här tabellerna utan versionskolumn, så en skrivning
+# till dem i någon process gör alla fragment inaktuella.
+fragments = VersionedCache(CommitteeCategory, Page, PostTag, maxsize=int(os.getenv("FRAGMENT_CACHE_SIZE", 4096)),
+    ttl=600, check_interval=CACHE_CHECK_INTERVAL)
+
+
+def fragment_key(instance):
+    return (type(instance).__name__, inspect(instance).identity, getattr(instance, "version", None))
+
+
+def cached_dict(instance, serializer, *args, depends_on=()):
+    """
+    serialize a versioned model instance, reusing the result until its version changes
+    @param instance: a model instance with a version column
+    @param serializer: the unbound method used to serialize it, e.g. Post.to_dict
+    @param args: extra arguments passed to the serializer
+    @param depends_on: other instances included in the serialized data. Instances without a version
+        column must be from one of the tables the fragment cache checks, like CommitteeCategory.
+    @returns dict: a copy of the serialized data
+    """
+    key = (serializer.__name__, args, fragment_key(instance)) + tuple(
+        fragment_key(dependency) for dependency in depends_on if dependency is not None)
+    return dict(fragments.get_or_load(key, lambda: serializer(instance, *args)))
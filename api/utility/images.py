@@ -0,0 +1,99 @@
+from PIL import Image as PILImage, ImageOps
+
+from api.db import db
+from api.models.image import Image
+from api.models.post import Post
+from api.models.user import User
+from api.utility.jobs import job, job_queue
+from api.utility.storage import upload_blob_data
+from api.utility.uploads import spool_upload, spool_b64
+
+import io
+import uuid
+
+# Bredderna som skapas, bilder som är smalare än en bredd får den inte i större storlek
+WIDTHS = (320, 640, 1280, 1920)
+
+# Format -> (mimetyp, filändelse, inställningar till Pillow). AVIF bara om Pillow kan spara det.
+# features.check("avif") varnar för okänd funktion i äldre Pillow, så det är registret över format som frågas.
+FORMATS = {"webp": ("image/webp", ".webp", {"quality": 80, "method": 4})}
+PILImage.init()
+if "AVIF" in PILImage.SAVE:
+    FORMATS["avif"] = ("image/avif", ".avif", {"quality": 60, "speed": 8})
+
+# Typ -> (modell, kolumnen med originalets url, kolumnen där varianterna sparas)
+TARGETS = {
+    "image": (Image, "url", "derivatives"),
+    "post": (Post, "header_image", "header_image_derivatives"),
+    "user": (User, "profile_picture", "profile_picture_derivatives"),
+}
+
+
+def render(source):
+    """
+    scales an image down to every width in WIDTHS that is smaller than the original,
+    or to its own width if it is smaller than all of them, in every format in FORMATS
+    @param source: a path or file object Pillow can open
+    @returns derivatives: (width, height, format, data), narrowest first
+    """
+    with PILImage.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        original = original.convert("RGBA" if original.mode in ("RGBA", "LA", "P") else "RGB")
+        widths = [width for width in WIDTHS if width < original.width] or [original.width]
+        derivatives = []
+        for width in widths:
+            height = max(round(original.height * width / original.width), 1)
+            scaled = original.resize((width, height), PILImage.LANCZOS)
+            for name, (_, _, options) in FORMATS.items():
+                data = io.BytesIO()
+                scaled.save(data, format=name.upper(), **options)
+                derivatives.append((width, height, name, data.getvalue()))
+        return derivatives
+
+
+def upload_derivatives(source):
+    """
+    @returns derivatives: {"url", "width", "height", "type"} for every rendered variant, as stored in the model
+    """
+    directory = "image_derivatives/" + str(uuid.uuid4()) + "/"
+    uploaded = []
+    for width, height, name, data in render(source):
+        mimetype, extension, _ = FORMATS[name]
+        url = upload_blob_data("medieteknik-static", data, mimetype, directory + str(width) + extension)
+        uploaded.append({"url": url, "width": width, "height": height, "type": mimetype})
+    return uploaded
+
+
+def queue_derivatives(target, id, url, source):
+    """
+    lets a job worker render and upload the variants of an uploaded image
+    @param target: a key in TARGETS
+    @param url: the original's url, the variants are only saved if the row still has it
+    @param source: the uploaded FileStorage, the image bytes or a base64 data url
+    @returns job_id
+    """
+    if isinstance(source, bytes):
+        path = job_queue.spool(source)
+    elif isinstance(source, str):
+        path, _, _ = spool_b64(source)
+    else:
+        path, _ = spool_upload(source)
+    return create_derivatives.enqueue(target, id, url, path)
+
+
+@job(max_attempts=3)
+def create_derivatives(target, id, url, path):
+    """
+    renders and uploads the variants of an image and saves them on its row
+    """
+    model, url_column, column = TARGETS[target]
+    derivatives = upload_derivatives(path)
+    job_queue.unspool(path)
+
+    instance = model.query.get(id)
+    # En ny bild kan ha laddats upp medan jobbet väntade, då hör varianterna inte till raden längre
+    if instance is None or getattr(instance, url_column) != url:
+        return None
+    setattr(instance, column, derivatives)
+    db.session.commit()
+    return derivatives
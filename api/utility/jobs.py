@@ -0,0 +1,302 @@
+from functools import wraps
+
+import json
+import multiprocessing
+import os
+import shutil
+import signal
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+import uuid
+
+JOB_QUEUE_PATH = os.getenv("JOB_QUEUE_PATH", os.path.join(os.getcwd(), "jobs.db"))
+JOB_SPOOL_PATH = os.getenv("JOB_SPOOL_PATH", os.path.join(os.getcwd(), "jobs"))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    name TEXT NOT NULL,
+    args TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL,
+    run_at REAL NOT NULL,
+    locked_by TEXT,
+    locked_until REAL,
+    result TEXT,
+    error TEXT,
+    user_id INTEGER,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS ix_jobs_status_run_at ON jobs (status, run_at);
+"""
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+# Jobbnamn -> (funktion, antal försök), fylls i av @job när modulerna importeras
+registry = {}
+
+# Användaren som lade till jobbet som körs just nu, jobb som det lägger till får samma användare
+running = threading.local()
+
+
+class RetryLater(Exception):
+    """
+    raised by a job that isn't done yet, e.g. waiting for Mux. The job runs again after delay
+    seconds, which counts as an attempt but isn't logged as an error.
+    """
+
+    def __init__(self, delay=None, message="Not done yet"):
+        super().__init__(message)
+        self.delay = delay
+
+
+class SQLiteJobQueue:
+    """
+    Jobs shared by the web workers and the job workers on the machine through one SQLite file,
+    so they survive restarts. A worker claims a job with a lease. If it dies the lease runs out
+    and another worker takes the job. A failed job is retried with exponential backoff until
+    it has used its attempts.
+    @param path: the SQLite file, created if missing
+    @param spool_path: folder for the files jobs work on, see spool
+    """
+
+    LEASE = 600
+    BACKOFF = 5
+
+    def __init__(self, path=JOB_QUEUE_PATH, spool_path=JOB_SPOOL_PATH):
+        self.path = path
+        self.spool_path = spool_path
+        self._local = threading.local()
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=10, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.executescript(SCHEMA)
+            if "user_id" not in [row[1] for row in connection.execute("PRAGMA table_info(jobs)")]:
+                # Filer från innan jobben fick en användare
+                try:
+                    connection.execute("ALTER TABLE jobs ADD COLUMN user_id INTEGER")
+                except sqlite3.OperationalError:
+                    pass
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def spool(self, source):
+        """
+        saves the data a job needs to a file of its own, instead of passing it in the arguments
+        @param source: bytes or a file object
+        @returns path: for the job to read and, when it succeeds, remove with unspool
+        """
+        os.makedirs(self.spool_path, exist_ok=True)
+        path = os.path.join(self.spool_path, uuid.uuid4().hex)
+        with open(path, "wb") as destination:
+            if isinstance(source, bytes):
+                destination.write(source)
+            else:
+                shutil.copyfileobj(source, destination)
+        return path
+
+    def unspool(self, path):
+        if path and os.path.exists(path):
+            os.remove(path)
+
+    def enqueue(self, name, args=(), kwargs=None, max_attempts=3, delay=0, user_id=None):
+        """
+        @param user_id: the user the job is done for, only they and admins can see it.
+            Defaults to the user of the job that is running, if any.
+        @returns id: the job id, used with get
+        """
+        if user_id is None:
+            user_id = getattr(running, "user_id", None)
+        now = time.time()
+        id = uuid.uuid4().hex
+        self._connection().execute("INSERT INTO jobs (id, name, args, status, max_attempts, run_at, user_id, created_at, updated_at) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (id, name, json.dumps({"args": list(args), "kwargs": kwargs or {}}), QUEUED, max_attempts, now + delay, user_id, now, now))
+        return id
+
+    def claim(self, worker):
+        """
+        takes the oldest job that is due, or one whose worker lost its lease
+        @returns job: (id, name, args, kwargs, attempt, user_id), or None when there is nothing to do
+        """
+        now = time.time()
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT id, name, args, attempts, user_id FROM jobs "
+                "WHERE (status = ? AND run_at <= ?) OR (status = ? AND locked_until < ?) ORDER BY run_at LIMIT 1",
+                (QUEUED, now, RUNNING, now)).fetchone()
+            if row is None:
+                connection.execute("COMMIT")
+                return None
+            id, name, args, attempts, user_id = row
+            connection.execute("UPDATE jobs SET status = ?, attempts = ?, locked_by = ?, locked_until = ?, updated_at = ? WHERE id = ?",
+                (RUNNING, attempts + 1, worker, now + self.LEASE, now, id))
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        args = json.loads(args)
+        return id, name, args["args"], args["kwargs"], attempts + 1, user_id
+
+    def succeed(self, id, result=None):
+        self._connection().execute("UPDATE jobs SET status = ?, result = ?, error = NULL, locked_by = NULL, locked_until = NULL, updated_at = ? WHERE id = ?",
+            (SUCCEEDED, json.dumps(result), time.time(), id))
+
+    def fail(self, id, error, delay=None):
+        """
+        queues the job again after a backoff, or marks it failed when it has used its attempts
+        @returns retried: if the job will run again
+        """
+        connection = self._connection()
+        attempts, max_attempts = connection.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ?", (id,)).fetchone()
+        now = time.time()
+        if attempts >= max_attempts:
+            connection.execute("UPDATE jobs SET status = ?, error = ?, locked_by = NULL, locked_until = NULL, updated_at = ? WHERE id = ?",
+                (FAILED, error, now, id))
+            return False
+        if delay is None:
+            delay = self.BACKOFF * 2 ** (attempts - 1)
+        connection.execute("UPDATE jobs SET status = ?, error = ?, run_at = ?, locked_by = NULL, locked_until = NULL, updated_at = ? WHERE id = ?",
+            (QUEUED, error, now + delay, now, id))
+        return True
+
+    def get(self, id):
+        """
+        @returns job: the status of a job as it is shown to the client, or None if there is no such job
+        """
+        row = self._connection().execute("SELECT id, name, status, attempts, max_attempts, result, error, user_id, created_at, updated_at "
+            "FROM jobs WHERE id = ?", (id,)).fetchone()
+        if row is None:
+            return None
+        id, name, status, attempts, max_attempts, result, error, user_id, created_at, updated_at = row
+        return {
+            "id": id,
+            "name": name,
+            "status": status,
+            "attempts": attempts,
+            "maxAttempts": max_attempts,
+            "result": json.loads(result) if result else None,
+            "error": error,
+            "userId": user_id,
+            "createdAt": created_at,
+            "updatedAt": updated_at
+        }
+
+    def prune(self, age=7 * 24 * 3600):
+        """
+        removes finished jobs older than age seconds
+        """
+        self._connection().execute("DELETE FROM jobs WHERE status IN (?, ?) AND updated_at < ?", (SUCCEEDED, FAILED, time.time() - age))
+
+    def stats(self):
+        rows = self._connection().execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return dict({QUEUED: 0, RUNNING: 0, SUCCEEDED: 0, FAILED: 0}, **dict(rows))
+
+
+job_queue = SQLiteJobQueue()
+
+
+def job(max_attempts=3):
+    """
+    registers a function as a job. Call f.enqueue(*args, **kwargs) to run it in a job worker,
+    or f.enqueue_for(user, *args, **kwargs) when the job's status is shown to that user.
+    The arguments must be JSON serializable.
+    @param max_attempts: how many times the job runs before it is marked failed
+    """
+    def decorator(f):
+        name = f.__module__ + "." + f.__name__
+        registry[name] = (f, max_attempts)
+
+        @wraps(f)
+        def enqueue(*args, **kwargs):
+            return job_queue.enqueue(name, args, kwargs, max_attempts=max_attempts)
+
+        @wraps(f)
+        def enqueue_for(user, *args, **kwargs):
+            return job_queue.enqueue(name, args, kwargs, max_attempts=max_attempts, user_id=user.id)
+        f.enqueue = enqueue
+        f.enqueue_for = enqueue_for
+        return f
+    return decorator
+
+
+def run_next(app, worker):
+    """
+    runs one job in an app context
+    @returns ran: False when the queue had nothing to do
+    """
+    from api.db import db
+
+    claimed = job_queue.claim(worker)
+    if claimed is None:
+        return False
+    id, name, args, kwargs, attempt, running.user_id = claimed
+    with app.app_context():
+        try:
+            if name not in registry:
+                raise LookupError("Unknown job " + name)
+            f, _ = registry[name]
+            result = f(*args, **kwargs)
+        except RetryLater as retry:
+            db.session.rollback()
+            job_queue.fail(id, str(retry), retry.delay)
+        except Exception:
+            db.session.rollback()
+            error = traceback.format_exc()
+            if not job_queue.fail(id, error):
+                app.logger.error("Job %s (%s) failed after %d attempts\n%s", id, name, attempt, error)
+        else:
+            job_queue.succeed(id, result)
+        finally:
+            running.user_id = None
+            db.session.remove()
+    return True
+
+
+def work(app, poll_interval=1.0):
+    """
+    runs jobs until the process gets SIGTERM or SIGINT, the current job is finished first
+    """
+    from api.db import db
+
+    # Anslutningar som ärvts från föräldraprocessen får inte delas
+    db.engine.dispose()
+    worker = "%s:%d" % (socket.gethostname(), os.getpid())
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *args: stopping.append(True))
+    signal.signal(signal.SIGINT, lambda *args: stopping.append(True))
+    while not stopping:
+        if not run_next(app, worker):
+            time.sleep(poll_interval)
+
+
+def work_pool(app, processes):
+    """
+    starts processes job workers and waits for them, SIGTERM or SIGINT stops them all
+    """
+    context = multiprocessing.get_context("fork")
+    workers = [context.Process(target=work, args=(app,), daemon=False) for _ in range(processes)]
+    for process in workers:
+        process.start()
+
+    def stop(*args):
+        for process in workers:
+            if process.is_alive():
+                process.terminate()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for process in workers:
+        process.join()
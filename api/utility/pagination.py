@@ -0,0 +1,158 @@
+from flask import request, abort
+from sqlalchemy import tuple_, literal, DateTime
+
+from api.utility.versions import VersionedCache, CACHE_CHECK_INTERVAL
+
+from datetime import datetime, timedelta
+import base64
+import json
+import os
+
+# Antal rader per filter, nyckeln är den kompilerade count-frågan med parametrar.
+# En skrivning till någon tabell i någon process gör alla antal inaktuella.
+counts = VersionedCache(maxsize=int(os.getenv("COUNT_CACHE_SIZE", 1024)), ttl=3600, check_interval=CACHE_CHECK_INTERVAL)
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    """
+    packs the sort key of the last row on a page into an opaque string
+    """
+    data = [value.isoformat() if isinstance(value, datetime) else value for value in values]
+    return base64.urlsafe_b64encode(json.dumps(data, separators=(",", ":")).encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor, columns):
+    """
+    @param columns: the sort columns, used to restore the types of the values
+    @returns values: the sort key packed by encode_cursor
+    @raises InvalidCursor: if the cursor wasn't created by encode_cursor for these columns
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != len(columns):
+            raise InvalidCursor(cursor)
+        return [datetime.fromisoformat(value) if value is not None and isinstance(column.type, DateTime) else value
+            for value, column in zip(values, columns)]
+    except (ValueError, TypeError):
+        raise InvalidCursor(cursor)
+
+
+def keyset_page(query, columns, cursor, per_page):
+    """
+    fetches one page ordered by the given columns, newest first, starting after the cursor.
+    Only the first column may be NULL, those rows are sorted last. With an index on the
+    columns every page is an index seek, no matter how deep into the list it is.
+    @param columns: the sort columns, the last one must be unique, e.g. (Post.scheduled_date, Post.date, Post.id)
+    @param cursor: the nextCursor of the previous page, or an empty string for the first page
+    @returns (items, next_cursor, has_more): next_cursor is None on the last page
+    """
+    first, rest = columns[0], columns[1:]
+    values = decode_cursor(cursor, columns) if cursor else None
+    bound = [literal(value, column.type) for value, column in zip(values, columns)] if values else None
+    ordered = lambda query, columns: query.order_by(*[column.desc() for column in columns])
+
+    # Raderna med och utan värde i första kolumnen hämtas var för sig så att båda frågorna blir en sökning i indexet
+    items = []
+    if values is None or values[0] is not None:
+        with_value = query.filter(first != None)
+        if values is not None:
+            with_value = with_value.filter(tuple_(*columns) < tuple_(*bound))
+        items = ordered(with_value, columns).limit(per_page + 1).all()
+    if len(items) <= per_page:
+        without_value = query.filter(first == None)
+        if values is not None and values[0] is None:
+            without_value = without_value.filter(tuple_(*rest) < tuple_(*bound[1:]))
+        items += ordered(without_value, rest).limit(per_page + 1 - len(items)).all()
+
+    has_more = len(items) > per_page
+    items = items[:per_page]
+    next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns]) if has_more else None
+    return items, next_cursor, has_more
+
+
+class Pagination:
+    """
+    one page of an offset paginated list
+    @param total: the number of rows matching the filter, None if it wasn't counted
+    """
+
+    def __init__(self, items, page, per_page, total, has_more):
+        self.items = items
+        self.page = page
+        self.per_page = per_page
+        self.total = total
+        self.has_more = has_more
+
+    def to_dict(self, data):
+        result = {"data": data, "hasMore": self.has_more}
+        if self.total is not None:
+            result["totalCount"] = self.total
+        return result
+
+
+def count_key(query):
+    """
+    @returns (key, expires_at): the compiled query and its parameters, with times rounded down to the minute
+        so that every request filtering on datetime.now() within a minute shares the key. expires_at is the
+        end of that minute as a unix timestamp, or None if the query has no times.
+    """
+    compiled = query.statement.compile()
+    params = []
+    minute = None
+    for name, value in compiled.params.items():
+        if isinstance(value, datetime):
+            value = value.replace(second=0, microsecond=0)
+            minute = value
+        elif isinstance(value, list):
+            value = tuple(value)
+        params.append((name, value))
+    expires_at = (minute + timedelta(minutes=1)).timestamp() if minute is not None else None
+    return (str(compiled), repr(sorted(params))), expires_at
+
+
+def cached_count(query, expires=None):
+    """
+    counts the rows matching a query, reusing the result until a table is written or the minute
+    of its times is over
+    @param expires: optional function returning the datetime when the count changes without a write,
+        e.g. when the next scheduled post is published. Only called when the rows are counted.
+    """
+    query = query.order_by(None)
+    key, expires_at = count_key(query)
+
+    def until(total):
+        changes_at = expires() if expires is not None else None
+        if changes_at is None:
+            return expires_at
+        return min(expires_at, changes_at.timestamp()) if expires_at is not None else changes_at.timestamp()
+
+    return counts.get_or_load(key, query.count, expires_at=until)
+
+
+def paginate(query, page, per_page, with_count=None, count_expires=None):
+    """
+    replaces Flask-SQLAlchemy's query.paginate. One extra row is fetched to find out if there
+    are more pages, and the total is only counted when asked for, from a cache per filter.
+    @param with_count: count the matching rows, by default false only if the request has ?withCount=false
+    @param count_expires: see cached_count
+    @returns pagination: a Pagination, use pagination.to_dict(data) for the response
+    """
+    if with_count is None:
+        with_count = request.args.get("withCount", "true").lower() != "false"
+    if page < 1 or per_page < 0:
+        abort(404)
+
+    items = query.limit(per_page + 1).offset((page - 1) * per_page).all()
+    if not items and page != 1:
+        abort(404)
+    has_more = len(items) > per_page
+    items = items[:per_page]
+
+    total = None
+    if with_count:
+        total = len(items) if page == 1 and not has_more else cached_count(query, count_expires)
+    return Pagination(items, page, per_page, total, has_more)
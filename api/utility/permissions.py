@@ -0,0 +1,54 @@
+from datetime import datetime
+import os
+
+from api.db import db
+from api.models.committee_post import CommitteePost, CommitteePostTerm
+from api.utility.versions import VersionedCache
+
+# Utskotten en användare sitter i just nu, per användar-id. Varje post går ut vid nästa mandatgräns
+# eller när någon process skriver till posterna eller mandaten.
+memberships = VersionedCache(CommitteePost, CommitteePostTerm, maxsize=int(os.getenv("PERMISSION_CACHE_SIZE", 1024)))
+
+
+def current_memberships(user_id):
+    """
+    @returns (committee_ids, expires_at): the committees and the unix time of the next term start or end, or None
+    """
+    now = datetime.now()
+    terms = db.session.query(CommitteePost.committee_id, CommitteePostTerm.start_date, CommitteePostTerm.end_date) \
+        .join(CommitteePostTerm.post).filter(CommitteePostTerm.user_id == user_id)
+
+    current = set()
+    boundaries = []
+    for committee_id, start_date, end_date in terms:
+        if start_date <= now <= end_date:
+            if committee_id is not None:
+                current.add(committee_id)
+            boundaries.append(end_date)
+        elif start_date > now:
+            boundaries.append(start_date)
+
+    return frozenset(current), min(boundaries).timestamp() if boundaries else None
+
+
+def committee_ids(user):
+    """
+    returns the ids of the committees the user currently holds a post in
+    @param user: a User
+    @returns committee_ids: a frozenset of committee ids
+    """
+    ids, _ = memberships.get_or_load(user.id, lambda: current_memberships(user.id), expires_at=lambda loaded: loaded[1])
+    return ids
+
+
+def can_edit(user, owner_id=None, committee_id=None):
+    """
+    checks if the user may edit something owned by a user or a committee
+    @param owner_id: id of the user who created the item
+    @param committee_id: id of the committee the item belongs to
+    """
+    if user.is_admin:
+        return True
+    if owner_id is not None and user.id == owner_id:
+        return True
+    return committee_id is not None and committee_id in committee_ids(user)
@@ -0,0 +1,82 @@
+from sqlalchemy import exc
+from sqlalchemy.pool import QueuePool
+
+import os
+import threading
+import time
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that also records how many connections have been checked out and how long
+    each checkout waited for a free connection, including the time to open a new one
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._stats_lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            with self._stats_lock:
+                self.timeouts += 1
+            raise
+        finally:
+            waited = time.perf_counter() - start
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+
+
+def engine_options(uri):
+    """
+    pool settings for the engine, read from the environment so each deployment can size its pool
+    against its gunicorn workers and threads. SQLite keeps SQLAlchemy's default pool.
+    """
+    options = {
+        "pool_pre_ping": os.getenv("SQLALCHEMY_POOL_PRE_PING", "true").lower() == "true"
+    }
+    if os.getenv("SQLALCHEMY_POOL_RECYCLE"):
+        options["pool_recycle"] = int(os.getenv("SQLALCHEMY_POOL_RECYCLE"))
+    if uri.startswith("sqlite"):
+        return options
+
+    options["poolclass"] = InstrumentedQueuePool
+    options["pool_size"] = int(os.getenv("SQLALCHEMY_POOL_SIZE", 5))
+    options["max_overflow"] = int(os.getenv("SQLALCHEMY_MAX_OVERFLOW", 10))
+    options["pool_timeout"] = int(os.getenv("SQLALCHEMY_POOL_TIMEOUT", 30))
+    options.setdefault("pool_recycle", 1800)
+    return options
+
+
+def pool_stats(engine):
+    """
+    @returns stats: the live state of the engine's pool in this worker process
+    """
+    pool = engine.pool
+    stats = {"class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        stats.update({
+            "size": pool.size(),
+            "checkedIn": pool.checkedin(),
+            "checkedOut": pool.checkedout(),
+            "overflow": max(pool.overflow(), 0),
+            "maxOverflow": pool._max_overflow
+        })
+    if isinstance(pool, InstrumentedQueuePool):
+        stats.update({
+            "checkouts": pool.checkouts,
+            "timeouts": pool.timeouts,
+            "waitTimeTotalMs": round(pool.wait_total * 1000, 3),
+            "waitTimeAvgMs": round(pool.wait_total * 1000 / pool.checkouts, 3) if pool.checkouts else 0,
+            "waitTimeMaxMs": round(pool.wait_max * 1000, 3)
+        })
+    return stats
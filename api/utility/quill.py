@@ -0,0 +1,18 @@
+import json
+
+
+def quill_to_text(value):
+    """
+    the plain text of a Quill delta, the format posts, events and pages store their bodies in
+    @param value: the delta as a JSON string, text that isn't a delta is returned as it is
+    @returns text: the inserted strings, embeds such as images are left out
+    """
+    if not value:
+        return ""
+    try:
+        delta = json.loads(value)
+    except ValueError:
+        return value
+    if not isinstance(delta, dict) or not isinstance(delta.get("ops"), list):
+        return value
+    return "".join(op["insert"] for op in delta["ops"] if isinstance(op, dict) and isinstance(op.get("insert"), str))
@@ -0,0 +1,217 @@
+from flask import request, jsonify, Response
+from functools import wraps
+
+from api.utility.changes import on_commit, table_name
+from api.utility.versions import avoid_lagging_replica
+
+import json
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+
+RESPONSE_CACHE_PATH = os.getenv("RESPONSE_CACHE_PATH", os.path.join(tempfile.gettempdir(), "medieteknik-response-cache.db"))
+RESPONSE_CACHE_TTL = int(os.getenv("RESPONSE_CACHE_TTL", 300))
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", 2048))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    content_type TEXT NOT NULL,
+    expires_at REAL NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entry_tags (
+    tag TEXT NOT NULL,
+    key TEXT NOT NULL,
+    PRIMARY KEY (tag, key)
+);
+CREATE TABLE IF NOT EXISTS tag_versions (
+    tag TEXT PRIMARY KEY,
+    version INTEGER NOT NULL
+);
+"""
+
+
+class SQLiteResponseCache:
+    """
+    Response bodies shared by all worker processes on the machine through one SQLite file.
+    Every entry is tagged with the tables it was built from and is removed when one of
+    them is written. Each tag also has a version, an entry is only stored if no tag
+    changed while the response was being built, so a slow request can't put back
+    data that a commit in another worker just invalidated.
+    @param path: the SQLite file, created if missing
+    @param maxsize: the number of entries kept, the oldest are removed first
+    """
+
+    PRUNE_INTERVAL = 100
+
+    def __init__(self, path=RESPONSE_CACHE_PATH, maxsize=RESPONSE_CACHE_SIZE):
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        self._hits = 0
+        self._misses = 0
+        self._writes = 0
+
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None or self._local.pid != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            connection.executescript(SCHEMA)
+            self._local.connection = connection
+            self._local.pid = os.getpid()
+        return connection
+
+    def get(self, key):
+        """
+        @returns (body, content_type): the cached response, or None if missing or expired
+        """
+        row = self._connection().execute(
+            "SELECT body, content_type FROM entries WHERE key = ? AND expires_at > ?", (key, time.time())).fetchone()
+        if row is None:
+            self._misses += 1
+            return None
+        self._hits += 1
+        return bytes(row[0]), row[1]
+
+    def tag_versions(self, tags):
+        rows = self._connection().execute(
+            "SELECT tag, version FROM tag_versions WHERE tag IN (%s)" % ",".join("?" * len(tags)), list(tags)).fetchall()
+        return dict(rows)
+
+    def set(self, key, body, content_type, tags, tag_versions, expires_at=None):
+        """
+        stores a response unless one of its tags was invalidated after tag_versions was read
+        @param tag_versions: the result of tag_versions(tags) from before the response was built
+        @param expires_at: unix time when the entry goes stale, defaults to now + RESPONSE_CACHE_TTL
+        """
+        if expires_at is None:
+            expires_at = time.time() + RESPONSE_CACHE_TTL
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            if self.tag_versions(tags) != tag_versions:
+                connection.execute("ROLLBACK")
+                return False
+            connection.execute("INSERT OR REPLACE INTO entries (key, body, content_type, expires_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                (key, body, content_type, expires_at, time.time()))
+            connection.execute("DELETE FROM entry_tags WHERE key = ?", (key,))
+            connection.executemany("INSERT INTO entry_tags (tag, key) VALUES (?, ?)", [(tag, key) for tag in tags])
+            self._writes += 1
+            if self._writes % self.PRUNE_INTERVAL == 0:
+                self._prune(connection)
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+        return True
+
+    def invalidate(self, tags):
+        """
+        removes every entry tagged with one of the given tags
+        """
+        tags = list(tags)
+        if not tags:
+            return
+        placeholders = ",".join("?" * len(tags))
+        connection = self._connection()
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            connection.executemany("INSERT OR IGNORE INTO tag_versions (tag, version) VALUES (?, 0)", [(tag,) for tag in tags])
+            connection.execute("UPDATE tag_versions SET version = version + 1 WHERE tag IN (%s)" % placeholders, tags)
+            connection.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entry_tags WHERE tag IN (%s))" % placeholders, tags)
+            connection.execute("DELETE FROM entry_tags WHERE key NOT IN (SELECT key FROM entries)")
+            connection.execute("COMMIT")
+        except sqlite3.Error:
+            connection.execute("ROLLBACK")
+            raise
+
+    def clear(self):
+        connection = self._connection()
+        connection.execute("DELETE FROM entries")
+        connection.execute("DELETE FROM entry_tags")
+
+    def _prune(self, connection):
+        connection.execute("DELETE FROM entries WHERE expires_at <= ?", (time.time(),))
+        connection.execute("DELETE FROM entries WHERE key IN (SELECT key FROM entries ORDER BY created_at DESC LIMIT -1 OFFSET ?)", (self.maxsize,))
+        connection.execute("DELETE FROM entry_tags WHERE key NOT IN (SELECT key FROM entries)")
+
+    def stats(self):
+        size = self._connection().execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+        return {
+            "hits": self._hits,
+            "misses": self._misses,
+            "size": size,
+            "maxSize": self.maxsize
+        }
+
+
+response_cache = SQLiteResponseCache()
+
+
+@on_commit
+def _invalidate(tables):
+    try:
+        response_cache.invalidate(tables)
+    except sqlite3.Error:
+        # Går det inte att ta bort posterna får ingen gammal data ligga kvar
+        response_cache.clear()
+
+
+def cache_key():
+    """
+    the request path with the query arguments sorted, so ?a=1&b=2 and ?b=2&a=1 share an entry
+    """
+    args = sorted((key, value) for key in request.args for value in request.args.getlist(key))
+    return json.dumps([request.path, args])
+
+
+def cached_response(*models, expires=None):
+    """
+    serves a GET handler from the shared response cache
+    @param models: the models the response is built from, a commit touching any of them removes the entry
+    @param expires: optional function returning the datetime when the response changes without a write,
+        e.g. when the next scheduled post is published. The entry is kept at most RESPONSE_CACHE_TTL seconds.
+    """
+    tags = sorted(table_name(model) for model in models)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            key = cache_key()
+            try:
+                cached = response_cache.get(key)
+                versions = response_cache.tag_versions(tags)
+            except sqlite3.Error:
+                return f(*args, **kwargs)
+
+            if cached is not None:
+                body, content_type = cached
+                response = Response(body, status=200, content_type=content_type)
+                response.headers["X-Cache"] = "HIT"
+                return response
+
+            avoid_lagging_replica(tags)
+            response = f(*args, **kwargs)
+            if isinstance(response, dict):
+                response = jsonify(response)
+            if isinstance(response, Response) and response.status_code == 200 and not response.direct_passthrough:
+                expires_at = time.time() + RESPONSE_CACHE_TTL
+                if expires is not None:
+                    changes_at = expires()
+                    if changes_at is not None:
+                        expires_at = min(expires_at, changes_at.timestamp())
+                try:
+                    response_cache.set(key, response.get_data(), response.content_type, tags, versions, expires_at)
+                except sqlite3.Error:
+                    pass
+                response.headers["X-Cache"] = "MISS"
+            return response
+
+        return decorated
+    return decorator
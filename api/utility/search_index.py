@@ -0,0 +1,328 @@
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, load_only, object_session
+
+from api.models.user import User
+from api.models.committee import Committee
+from api.models.committee_post import CommitteePost
+from api.models.document import Document
+from api.models.post import Post
+from api.models.event import Event
+from api.models.page import Page, PageRevision
+from api.utility.quill import quill_to_text
+
+from datetime import datetime
+import json
+import re
+import time
+
+TABLE = "search_index"
+
+# Varje sökbar rad får ett rowid av typen och id:t så att den kan ersättas utan att söka igenom indexet
+KINDS = ["user", "committee", "committee_post", "document", "post", "event", "page"]
+KIND_BITS = 4
+
+
+def join(*values):
+    return " ".join(value for value in values if value)
+
+
+def isoformat(value):
+    return value.isoformat() if value else None
+
+
+def user_document(user):
+    return {
+        "title": join(user.first_name, user.last_name, user.frack_name),
+        "body": join(user.kth_id, user.email),
+        "data": {
+            "firstName": user.first_name,
+            "lastName": user.last_name,
+            "frackName": user.frack_name,
+            "kthId": user.kth_id,
+            "profilePicture": user.profile_picture
+        }
+    }
+
+
+def committee_document(committee):
+    return {
+        "title": committee.name,
+        "body": committee.description,
+        "data": {"name": committee.name, "logo": committee.logo}
+    }
+
+
+def committee_post_document(post):
+    return {
+        "title": post.name,
+        "body": None,
+        "data": {"name": post.name, "email": post.officials_email, "committeeId": post.committee_id}
+    }
+
+
+def document_document(document):
+    return {
+        "title": join(document.title, document.title_en),
+        "body": None,
+        "data": {
+            "title": {"se": document.title, "en": document.title_en},
+            "filename": document.fileName,
+            "thumbnail": document.thumbnail
+        }
+    }
+
+
+def post_document(post):
+    if post.draft:
+        return None
+    return {
+        "title": join(post.title, post.title_en),
+        "body": join(quill_to_text(post.body), quill_to_text(post.body_en)),
+        "published_at": post.scheduled_date,
+        "data": {
+            "title": {"se": post.title, "en": post.title_en},
+            "headerImage": post.header_image,
+            "date": isoformat(post.scheduled_date or post.date)
+        }
+    }
+
+
+def event_document(event):
+    if event.draft:
+        return None
+    return {
+        "title": join(event.title, event.title_en),
+        "body": join(event.location, quill_to_text(event.body), quill_to_text(event.body_en)),
+        "published_at": event.scheduled_date,
+        "data": {
+            "title": {"se": event.title, "en": event.title_en},
+            "headerImage": event.header_image,
+            "location": event.location,
+            "eventDate": isoformat(event.event_date),
+            "endDate": isoformat(event.end_date)
+        }
+    }
+
+
+def page_document(page):
+    # Revisionerna hämtas på nytt eftersom en ny revision inte finns i page.revisions förrän sidan laddas om
+    session = object_session(page)
+    with session.no_autoflush:
+        revision = session.query(PageRevision.title_sv, PageRevision.title_en, PageRevision.content_sv,
+            PageRevision.content_en, PageRevision.image) \
+            .filter(PageRevision.page_id == page.id, PageRevision.published == True) \
+            .order_by(PageRevision.timestamp.desc()).first()
+    if revision is None:
+        return None
+    return {
+        "title": join(revision.title_sv, revision.title_en),
+        "body": join(quill_to_text(revision.content_sv), quill_to_text(revision.content_en)),
+        "data": {
+            "slug": page.slug,
+            "title": {"se": revision.title_sv, "en": revision.title_en},
+            "image": revision.image
+        }
+    }
+
+
+# Modell -> (typ, funktion som ger texten och den förenklade projektionen som söksvaret visar).
+# Funktionen ger None för rader som inte ska gå att hitta, som utkast.
+DOCUMENTS = {
+    User: ("user", user_document),
+    Committee: ("committee", committee_document),
+    CommitteePost: ("committee_post", committee_post_document),
+    Document: ("document", document_document),
+    Post: ("post", post_document),
+    Event: ("event", event_document),
+    Page: ("page", page_document),
+}
+
+# Kolumnerna som funktionerna ovan läser. rebuild hämtar bara dem, så att migreringarna som bygger
+# indexet fungerar mot tabeller som ännu saknar kolumner som senare migreringar lägger till.
+COLUMNS = {
+    User: ["first_name", "last_name", "frack_name", "kth_id", "email", "profile_picture"],
+    Committee: ["name", "description", "logo"],
+    CommitteePost: ["name", "officials_email", "committee_id"],
+    Document: ["title", "title_en", "fileName", "thumbnail"],
+    Post: ["draft", "title", "title_en", "body", "body_en", "scheduled_date", "header_image", "date"],
+    Event: ["draft", "title", "title_en", "location", "body", "body_en", "scheduled_date", "header_image",
+        "event_date", "end_date"],
+    Page: ["slug"],
+}
+
+# Modell -> funktion som ger raden i indexet som den ingår i
+PARTS = {
+    PageRevision: lambda revision: object_session(revision).query(Page).get(revision.page_id),
+}
+
+
+def row_id(kind, ref_id):
+    return (ref_id << KIND_BITS) | (KINDS.index(kind) + 1)
+
+
+def search_terms(text):
+    """
+    the words of a search string, everything else is dropped so the query syntax can't be injected
+    """
+    return re.findall(r"\w+", text.lower(), re.UNICODE)
+
+
+class SQLiteSearchBackend:
+    """
+    FTS5 table, ranked with bm25 where a hit in the title weighs ten times a hit in the body
+    """
+
+    def create(self, connection):
+        connection.execute("CREATE VIRTUAL TABLE IF NOT EXISTS %s USING fts5("
+            "kind UNINDEXED, ref_id UNINDEXED, title, body, data UNINDEXED, published_at UNINDEXED, "
+            "prefix='2 3', tokenize='unicode61')" % TABLE)
+
+    def drop(self, connection):
+        connection.execute("DROP TABLE IF EXISTS %s" % TABLE)
+
+    def upsert(self, connection, kind, ref_id, document):
+        self.delete(connection, kind, ref_id)
+        published_at = str(document["published_at"]) if document.get("published_at") else None
+        connection.execute("INSERT INTO %s (rowid, kind, ref_id, title, body, data, published_at) VALUES (?, ?, ?, ?, ?, ?, ?)" % TABLE,
+            (row_id(kind, ref_id), kind, ref_id, document["title"] or "", document["body"] or "", json.dumps(document["data"]), published_at))
+
+    def delete(self, connection, kind, ref_id):
+        connection.execute("DELETE FROM %s WHERE rowid = ?" % TABLE, (row_id(kind, ref_id),))
+
+    def search(self, connection, terms, now, limit, offset):
+        # Bara det sista ordet kan vara påbörjat
+        query = " ".join(['"%s"' % term for term in terms[:-1]] + ['"%s"*' % terms[-1]])
+        return connection.execute("SELECT kind, ref_id, data FROM %s WHERE %s MATCH ? "
+            "AND (published_at IS NULL OR published_at <= ?) "
+            "ORDER BY bm25(%s, 0, 0, 10.0, 1.0, 0, 0) LIMIT ? OFFSET ?" % (TABLE, TABLE, TABLE),
+            (query, str(now), limit, offset)).fetchall()
+
+
+class PostgresSearchBackend:
+    """
+    table with a generated tsvector column and a GIN index, ranked with ts_rank where
+    the title has weight A and the body weight B. The simple configuration is used since
+    the content is in both Swedish and English.
+    """
+
+    def create(self, connection):
+        connection.execute("CREATE TABLE IF NOT EXISTS %s ("
+            "kind VARCHAR NOT NULL, ref_id INTEGER NOT NULL, title TEXT, body TEXT, data TEXT, published_at TIMESTAMP, "
+            "document tsvector GENERATED ALWAYS AS ("
+            "setweight(to_tsvector('simple', coalesce(title, '')), 'A') || "
+            "setweight(to_tsvector('simple', coalesce(body, '')), 'B')) STORED, "
+            "PRIMARY KEY (kind, ref_id))" % TABLE)
+        connection.execute("CREATE INDEX IF NOT EXISTS ix_%s_document ON %s USING GIN (document)" % (TABLE, TABLE))
+
+    def drop(self, connection):
+        connection.execute("DROP TABLE IF EXISTS %s" % TABLE)
+
+    def upsert(self, connection, kind, ref_id, document):
+        connection.execute("INSERT INTO %s (kind, ref_id, title, body, data, published_at) VALUES (%%s, %%s, %%s, %%s, %%s, %%s) "
+            "ON CONFLICT (kind, ref_id) DO UPDATE SET title = excluded.title, body = excluded.body, "
+            "data = excluded.data, published_at = excluded.published_at" % TABLE,
+            (kind, ref_id, document["title"], document["body"], json.dumps(document["data"]), document.get("published_at")))
+
+    def delete(self, connection, kind, ref_id):
+        connection.execute("DELETE FROM %s WHERE kind = %%s AND ref_id = %%s" % TABLE, (kind, ref_id))
+
+    def search(self, connection, terms, now, limit, offset):
+        query = " & ".join(terms[:-1] + ["%s:*" % terms[-1]])
+        return connection.execute("SELECT kind, ref_id, data FROM %s, to_tsquery('simple', %%s) query "
+            "WHERE document @@ query AND (published_at IS NULL OR published_at <= %%s) "
+            "ORDER BY ts_rank(document, query) DESC LIMIT %%s OFFSET %%s" % TABLE,
+            (query, now, limit, offset)).fetchall()
+
+
+def backend(connection):
+    if connection.dialect.name == "postgresql":
+        return PostgresSearchBackend()
+    return SQLiteSearchBackend()
+
+
+# Om indexet finns, per databas. Saknas det kontrolleras det igen efter en minut.
+_available = {}
+RECHECK_INTERVAL = 60
+
+
+def is_available(connection):
+    key = str(connection.engine.url)
+    available, checked_at = _available.get(key, (False, 0))
+    if not available and time.time() - checked_at > RECHECK_INTERVAL:
+        available = connection.dialect.has_table(connection, TABLE)
+        _available[key] = (available, time.time())
+    return available
+
+
+def create(connection):
+    backend(connection).create(connection)
+    _available[str(connection.engine.url)] = (True, time.time())
+
+
+def drop(connection):
+    backend(connection).drop(connection)
+    _available.pop(str(connection.engine.url), None)
+
+
+def primary_key(instance):
+    # Identiteten sätts först efter flush, så nya rader läser id:t från kolumnen
+    return inspect(instance).mapper.primary_key_from_instance(instance)[0]
+
+
+def index(connection, instance):
+    kind, to_document = DOCUMENTS[type(instance)]
+    document = to_document(instance)
+    if document is None:
+        backend(connection).delete(connection, kind, primary_key(instance))
+    else:
+        backend(connection).upsert(connection, kind, primary_key(instance), document)
+
+
+def rebuild(connection):
+    """
+    indexes every searchable row again, used when the index is created
+    """
+    session = Session(bind=connection)
+    try:
+        for model in DOCUMENTS:
+            for instance in session.query(model).options(load_only(*COLUMNS[model])).yield_per(500):
+                index(connection, instance)
+    finally:
+        session.close()
+
+
+@event.listens_for(Session, "after_flush")
+def _index_flushed(session, flush_context):
+    changed = [instance for instance in session.new if type(instance) in DOCUMENTS or type(instance) in PARTS]
+    changed += [instance for instance in session.dirty if (type(instance) in DOCUMENTS or type(instance) in PARTS)
+        and session.is_modified(instance)]
+    deleted = [instance for instance in session.deleted if type(instance) in DOCUMENTS]
+    changed += [instance for instance in session.deleted if type(instance) in PARTS]
+    if not changed and not deleted:
+        return
+
+    connection = session.connection()
+    if not is_available(connection):
+        return
+    with session.no_autoflush:
+        changed = [PARTS[type(instance)](instance) if type(instance) in PARTS else instance for instance in changed]
+    search_backend = backend(connection)
+    for instance in set(changed) - set(deleted) - {None}:
+        index(connection, instance)
+    for instance in deleted:
+        search_backend.delete(connection, DOCUMENTS[type(instance)][0], primary_key(instance))
+
+
+def search(session, text, page, per_page):
+    """
+    @returns (results, has_more): the best matches first, each a slim projection with its type and id.
+    Drafts and posts or events scheduled for later are left out.
+    """
+    terms = search_terms(text)
+    connection = session.connection()
+    if not terms or not is_available(connection):
+        return [], False
+
+    rows = backend(connection).search(connection, terms, datetime.now(), per_page + 1, (page - 1) * per_page)
+    results = [dict(json.loads(data), type=kind, id=ref_id) for kind, ref_id, data in rows[:per_page]]
+    return results, len(rows) > per_page
@@ -0,0 +1,105 @@
+import base64
+import json
+import re
+import threading
+import time
+
+import requests
+
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v1/certs"
+
+
+def key_id(token):
+    """
+    read the key id from the header of a JWT without verifying it
+    @param token: the encoded token
+    @returns kid: the key id, or None if the header can't be read
+    """
+    if isinstance(token, bytes):
+        token = token.decode("utf-8")
+    try:
+        header = token.split(".")[0]
+        header += "=" * (-len(header) % 4)
+        return json.loads(base64.urlsafe_b64decode(header)).get("kid")
+    except (ValueError, AttributeError):
+        return None
+
+
+class SigningKeyStore:
+    """
+    Keeps the public certificates used to verify Google ID tokens in memory.
+    The certificates are fetched once per process and refreshed by a background
+    thread before Google's Cache-Control max-age runs out, so verifying a token
+    never needs a network call. If key_file is given the certificates are read
+    from that file instead and never refreshed, which is what tests and benchmarks use.
+    @param url: where to fetch the certificates, in the format {"key id": "x509 certificate"}
+    @param key_file: optional path to a local JSON file in the same format
+    """
+
+    MIN_REFRESH_INTERVAL = 60
+    DEFAULT_MAX_AGE = 3600
+
+    def __init__(self, url=GOOGLE_CERTS_URL, key_file=None):
+        self.url = url
+        self.key_file = key_file
+        self._certs = None
+        self._fetched_at = 0
+        self._max_age = self.DEFAULT_MAX_AGE
+        self._lock = threading.Lock()
+        self._thread = None
+
+    def certs(self):
+        if self._certs is None:
+            with self._lock:
+                if self._certs is None:
+                    self._load()
+        self._start_refresher()
+        return self._certs
+
+    def certs_for(self, token):
+        """
+        returns the certificates, refreshing them first if the token was signed
+        with a key we haven't seen yet (Google has rotated its keys)
+        """
+        certs = self.certs()
+        kid = key_id(token)
+        if kid and kid not in certs and time.time() - self._fetched_at > self.MIN_REFRESH_INTERVAL:
+            with self._lock:
+                self._load()
+            certs = self._certs
+        return certs
+
+    def _load(self):
+        if self.key_file:
+            with open(self.key_file) as f:
+                self._certs = json.load(f)
+        else:
+            response = requests.get(self.url, timeout=10)
+            response.raise_for_status()
+            self._certs = response.json()
+            self._max_age = self._parse_max_age(response.headers.get("Cache-Control", ""))
+        self._fetched_at = time.time()
+
+    def _parse_max_age(self, cache_control):
+        match = re.search(r"max-age=(\d+)", cache_control)
+        return int(match.group(1)) if match else self.DEFAULT_MAX_AGE
+
+    def _start_refresher(self):
+        # Tråden startas först när nyckeln används, dvs efter att gunicorn har forkat workern
+        if self.key_file or (self._thread is not None and self._thread.is_alive()):
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._refresh_loop, name="signing-key-refresh", daemon=True)
+                self._thread.start()
+
+    def _refresh_loop(self):
+        while True:
+            # Hämta nya nycklar när 90% av max-age har gått
+            delay = max(self._fetched_at + self._max_age * 0.9 - time.time(), self.MIN_REFRESH_INTERVAL)
+            time.sleep(delay)
+            try:
+                with self._lock:
+                    self._load()
+            except (requests.RequestException, ValueError):
+                self._fetched_at = time.time() - self._max_age * 0.9
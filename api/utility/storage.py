@@ -1,49 +1,145 @@
 from google.cloud import storage
 from werkzeug.utils import secure_filename
 import uuid
+import io
 import os
 import tempfile
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from api.utility.base64 import parse_b64
 import shutil
-from pdf2image import convert_from_bytes
+from pdf2image import convert_from_path
 
-def upload_blob(bucket_name, source_file, destination_blob_name):
-    if os.environ.get('FLASK_ENV') == "development":
-        save_folder = os.path.join(os.getcwd(), "api", "static")
-        filename = os.path.join(save_folder, destination_blob_name)
+class LocalStorage:
+    """
+    saves uploads under api/static, served by the development server
+    """
+
+    def __init__(self, save_folder=None, base_url="http://localhost:5000/static/"):
+        self.save_folder = save_folder or os.path.join(os.getcwd(), "api", "static")
+        self.base_url = base_url
+
+    def path(self, destination_blob_name):
+        filename = os.path.join(self.save_folder, destination_blob_name)
         os.makedirs(os.path.dirname(filename), exist_ok=True)
+        return filename
+
+    def upload_file(self, bucket_name, source_file, destination_blob_name, content_type=None):
+        filename = self.path(destination_blob_name)
         if isinstance(source_file, str):
             shutil.copyfile(source_file, filename)
         else:
             source_file.save(filename)
-        return "http://localhost:5000/static/" + destination_blob_name
-    else:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name)
+        return self.base_url + destination_blob_name
+
+    def upload_data(self, bucket_name, data, data_mimetype, destination_blob_name):
+        with open(self.path(destination_blob_name), "wb") as destination:
+            destination.write(data)
+        return self.base_url + destination_blob_name
+
+class GCSStorage:
+    """
+    uploads to Google Cloud Storage through one client per process. The client keeps the
+    credentials and a pooled HTTP session, so only the first upload pays for credential
+    discovery and new connections. It is created again in a forked worker.
+    """
+
+    def __init__(self, pool_size=None, client_options=None, credentials=None, project=None):
+        self.pool_size = pool_size or int(os.getenv("STORAGE_POOL_SIZE", 10))
+        self.client_options = client_options
+        self.credentials = credentials
+        self.project = project
+        self.lock = threading.Lock()
+        self.pid = None
+        self.client = None
+        self.buckets = {}
 
-        blob.upload_from_file(source_file)
+    def create_client(self):
+        import google.auth
+        from google.auth.transport.requests import AuthorizedSession
+        from requests.adapters import HTTPAdapter
+
+        credentials, project = self.credentials, self.project
+        if credentials is None:
+            credentials, project = google.auth.default(scopes=storage.Client.SCOPE)
+        session = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=self.pool_size, pool_maxsize=self.pool_size)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+        return storage.Client(project=project, credentials=credentials, _http=session, client_options=self.client_options)
+
+    def bucket(self, bucket_name):
+        with self.lock:
+            if self.pid != os.getpid():
+                self.client = self.create_client()
+                self.buckets = {}
+                self.pid = os.getpid()
+            if bucket_name not in self.buckets:
+                self.buckets[bucket_name] = self.client.bucket(bucket_name)
+            return self.buckets[bucket_name]
+
+    def upload_file(self, bucket_name, source_file, destination_blob_name, content_type=None):
+        blob = self.bucket(bucket_name).blob(destination_blob_name)
+        if isinstance(source_file, str):
+            blob.upload_from_filename(source_file, content_type=content_type)
+        else:
+            blob.upload_from_file(source_file, content_type=content_type)
         blob.make_public()
         return blob.public_url
 
-def upload_blob_data(bucket_name, data, data_mimetype, destination_blob_name):
-    if os.environ.get('FLASK_ENV') == "development":
-        save_folder = os.path.join(os.getcwd(), "api", "static")
-        filename = os.path.join(save_folder, destination_blob_name)
-        os.makedirs(os.path.dirname(filename), exist_ok=True)
-        source_file = open(filename, "wb")
-        source_file.write(data)
-        source_file.close()
-        return "http://localhost:5000/static/" + destination_blob_name
-    else:
-        storage_client = storage.Client()
-        bucket = storage_client.bucket(bucket_name)
-        blob = bucket.blob(destination_blob_name)
-
+    def upload_data(self, bucket_name, data, data_mimetype, destination_blob_name):
+        blob = self.bucket(bucket_name).blob(destination_blob_name)
         blob.upload_from_string(data, content_type=data_mimetype)
         blob.make_public()
         return blob.public_url
 
+def create_backend():
+    """
+    chooses where uploads go, once at startup. STORAGE_BACKEND can be "local" or "gcs",
+    otherwise the development server saves locally and everything else uses GCS.
+    """
+    name = os.getenv("STORAGE_BACKEND") or ("local" if os.environ.get('FLASK_ENV') == "development" else "gcs")
+    if name == "local":
+        return LocalStorage()
+    if name == "gcs":
+        return GCSStorage()
+    raise ValueError("Unknown storage backend \"" + name + "\"")
+
+backend = create_backend()
+
+def upload_blob(bucket_name, source_file, destination_blob_name, content_type=None):
+    return backend.upload_file(bucket_name, source_file, destination_blob_name, content_type)
+
+def upload_blob_data(bucket_name, data, data_mimetype, destination_blob_name):
+    return backend.upload_data(bucket_name, data, data_mimetype, destination_blob_name)
+
+# Delas av alla anrop i processen, så ett stort album inte kan starta hur många uppladdningar som helst
+upload_pool = ThreadPoolExecutor(max_workers=int(os.getenv("UPLOAD_WORKERS", 8)), thread_name_prefix="upload")
+
+def upload_all(upload, sources, *args):
+    """
+    runs an upload function for every source on the shared upload pool
+    @param upload: e.g. upload_album_photo, called as upload(source, *args)
+    @returns results: (source, url, error) in the order of sources, error is None for the uploads that succeeded
+    """
+    def attempt(source):
+        try:
+            return source, upload(source, *args), None
+        except ValueError as error:
+            return source, None, error
+        except Exception as error:
+            logging.getLogger(__name__).exception("Upload of %s failed", getattr(source, "filename", source))
+            return source, None, error
+    return list(upload_pool.map(attempt, sources))
+
+def upload_errors(results):
+    """
+    @returns errors: the failed uploads of upload_all, as they are reported to the client
+    """
+    return [{"filename": source.filename, "message": str(error) if isinstance(error, ValueError) else "Upload failed"}
+        for source, _, error in results if error is not None]
+
 def upload_file(source_file, destination_directory = "", allowed_extensions = []):
     filename = uuid
     original_filename, extension = os.path.splitext(secure_filename(source_file.filename))
@@ -77,11 +173,13 @@ def upload_b64_image(data):
     filename = str(uuid.uuid4()) + ext
     return upload_blob_data("medieteknik-static", data, mimetype, "images/" + filename)
 
-def upload_b64_document(data, name, date):
-    data, ext, mimetype = parse_b64(data)
+def upload_document_file(path, ext, mimetype, name, date):
     filename = name + ext
 
-    thumbnails = convert_from_bytes(data, dpi=72, fmt="png", single_file=True, size=(300, None))
-    thumbnail_filename = upload_blob("medieteknik-static", thumbnails[0], "document_thumbnails/" + str(uuid.uuid4()) + ".png")
-    document_filename = upload_blob_data("medieteknik-static", data, mimetype, "documents/" + str(date.year) + "/" + str(date.month) + "/" + str(date.day) + "/" + filename)
+    # Bara första sidan behövs till miniatyren, och filen laddas upp utan att läsas in i minnet
+    thumbnails = convert_from_path(path, dpi=72, fmt="png", single_file=True, size=(300, None))
+    thumbnail = io.BytesIO()
+    thumbnails[0].save(thumbnail, format="PNG")
+    thumbnail_filename = upload_blob_data("medieteknik-static", thumbnail.getvalue(), "image/png", "document_thumbnails/" + str(uuid.uuid4()) + ".png")
+    document_filename = upload_blob("medieteknik-static", path, "documents/" + str(date.year) + "/" + str(date.month) + "/" + str(date.day) + "/" + filename, mimetype)
     return document_filename, thumbnail_filename
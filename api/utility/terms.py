@@ -0,0 +1,31 @@
+from sqlalchemy import func, case
+
+from api.db import db
+from api.models.committee_post import CommitteePostTerm
+
+from datetime import datetime
+
+# Vilka funktionärer som sitter beror på datumet, svar som visar dem ändras när en mandatperiod
+# börjar eller slutar även om inget skrivs till databasen
+
+def latest_term_change():
+    """
+    the latest start or end of a term that has passed, the current officials only change at these
+    """
+    now = datetime.now()
+    started, ended = db.session.query(
+        func.max(case([(CommitteePostTerm.start_date <= now, CommitteePostTerm.start_date)])),
+        func.max(case([(CommitteePostTerm.end_date < now, CommitteePostTerm.end_date)]))
+    ).one()
+    return max((change for change in (started, ended) if change is not None), default=None)
+
+def next_term_change():
+    """
+    the next start or end of a term, cached lists of current officials expire then
+    """
+    now = datetime.now()
+    starts, ends = db.session.query(
+        func.min(case([(CommitteePostTerm.start_date > now, CommitteePostTerm.start_date)])),
+        func.min(case([(CommitteePostTerm.end_date >= now, CommitteePostTerm.end_date)]))
+    ).one()
+    return min((change for change in (starts, ends) if change is not None), default=None)
@@ -0,0 +1,113 @@
+from flask import Request
+
+from api.utility.jobs import job_queue
+
+import base64
+import hashlib
+import os
+import re
+import shutil
+import tempfile
+
+# Mindre uppladdningar hålls i minnet som Werkzeug gör som standard
+SPOOL_THRESHOLD = 500 * 1024
+CHUNK_SIZE = 64 * 1024
+
+
+class HashingSpool:
+    """
+    a file in the job spool folder that computes the sha256 of everything written to it.
+    The file is removed when it is closed, unless keep has handed it on to a job.
+    """
+
+    def __init__(self, directory=None):
+        directory = directory or job_queue.spool_path
+        os.makedirs(directory, exist_ok=True)
+        self.file = tempfile.NamedTemporaryFile(dir=directory, delete=False)
+        self.name = self.file.name
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.kept = False
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.file.write(data)
+
+    def keep(self):
+        """
+        @returns (path, sha256): the finished file, it is no longer removed on close
+        """
+        self.kept = True
+        self.file.close()
+        return self.name, self.sha256.hexdigest()
+
+    def close(self):
+        if not self.file.closed:
+            self.file.close()
+        if not self.kept and os.path.exists(self.name):
+            os.remove(self.name)
+
+    def __getattr__(self, name):
+        return getattr(self.file, name)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+class StreamingRequest(Request):
+    """
+    writes large file parts of multipart requests straight to the job spool folder while they
+    are parsed, so a job can take over the file without it being read into memory or copied
+    """
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        if total_content_length is None or total_content_length > SPOOL_THRESHOLD:
+            return HashingSpool()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+def spool_upload(file):
+    """
+    hands an uploaded file over to a job
+    @param file: a werkzeug FileStorage
+    @returns (path, sha256): the spooled file, for the job to remove with job_queue.unspool
+    """
+    if isinstance(file.stream, HashingSpool):
+        return file.stream.keep()
+    spool = HashingSpool()
+    file.stream.seek(0)
+    shutil.copyfileobj(file.stream, spool, CHUNK_SIZE)
+    return spool.keep()
+
+
+def spool_b64(raw_data):
+    """
+    decodes a base64 data url to a spooled file a few kilobytes at a time, instead of
+    splitting and copying the whole string like parse_b64
+    @returns (path, sha256, mimetype): the spooled file, for the job to remove with job_queue.unspool
+    @raises ValueError: if raw_data is not a base64 data url, nothing is left in the spool folder then
+    """
+    header_end = raw_data.find(",")
+    if header_end < 0 or ":" not in raw_data[:header_end]:
+        raise ValueError("not a data url")
+    mimetype = raw_data[:header_end].split(";")[0].split(":")[1]
+    spool = HashingSpool()
+    try:
+        rest = ""
+        # Ett jämnt antal block om fyra tecken avkodas åt gången, blanktecken hoppas över
+        for start in range(header_end + 1, len(raw_data), CHUNK_SIZE):
+            chunk = rest + re.sub(r"\s", "", raw_data[start:start + CHUNK_SIZE])
+            usable = len(chunk) - len(chunk) % 4
+            spool.write(base64.b64decode(chunk[:usable], validate=True))
+            rest = chunk[usable:]
+        if rest:
+            spool.write(base64.b64decode(rest + "=" * (-len(rest) % 4), validate=True))
+    except Exception:
+        spool.close()
+        raise
+    path, sha256 = spool.keep()
+    return path, sha256, mimetype
@@ -0,0 +1,225 @@
+from flask import request, jsonify, make_response, Response
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+from functools import wraps
+
+from api.db import db
+from api.models.table_version import TableVersion
+from api.utility.cache import TTLCache
+from api.utility.changes import on_commit, table_name
+
+from datetime import datetime, timezone
+import hashlib
+import itertools
+import os
+import time
+
+versions_table = TableVersion.__table__
+
+# Hur ofta cacher som får vara något efter läser table_version, i sekunder
+CACHE_CHECK_INTERVAL = float(os.getenv("CACHE_CHECK_INTERVAL", 2))
+
+
+def bump_table_versions(connection, names):
+    """
+    increments the version of every given table in the same transaction as the write
+    """
+    names = set(names) - {versions_table.name}
+    if not names:
+        return
+    now = datetime.utcnow()
+
+    def bump(names):
+        return connection.execute(versions_table.update()
+            .where(versions_table.c.name.in_(names))
+            .values(version=versions_table.c.version + 1, updated_at=now)).rowcount
+
+    if bump(names) < len(names):
+        existing = set(name for name, in connection.execute(
+            versions_table.select().with_only_columns([versions_table.c.name]).where(versions_table.c.name.in_(names))))
+        missing = names - existing
+        if missing:
+            # En annan transaktion kan skapa samma rad samtidigt, då räknas den bara upp
+            connection.execute(insert_ignore(connection), [{"name": name, "version": 0, "updated_at": now} for name in missing])
+            bump(missing)
+
+
+def insert_ignore(connection):
+    """
+    @returns insert: an insert into table_version that skips rows whose name already exists
+    """
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+        return insert(versions_table).on_conflict_do_nothing(index_elements=[versions_table.c.name])
+    if connection.dialect.name == "mysql":
+        return versions_table.insert().prefix_with("IGNORE")
+    return versions_table.insert().prefix_with("OR IGNORE")
+
+
+@event.listens_for(Session, "after_flush")
+def _bump_flushed(session, flush_context):
+    names = set()
+    for instance in itertools.chain(session.new, session.deleted):
+        names.add(inspect(instance).mapper.local_table.name)
+    for instance in session.dirty:
+        if session.is_modified(instance):
+            names.add(inspect(instance).mapper.local_table.name)
+    bump_table_versions(session.connection(), names)
+
+
+@event.listens_for(Session, "after_bulk_update")
+@event.listens_for(Session, "after_bulk_delete")
+def _bump_bulk(context):
+    bump_table_versions(context.session.connection(), [context.primary_table.name])
+
+
+def read_table_versions(names=None):
+    """
+    @param names: the tables to read, every table if None
+    @returns versions: a tuple of (name, version), sorted by name
+    """
+    query = db.session.query(TableVersion.name, TableVersion.version)
+    if names is not None:
+        query = query.filter(TableVersion.name.in_(names))
+    return tuple(query.order_by(TableVersion.name))
+
+
+def replica_lags(names):
+    """
+    checks if this request reads from a replica that hasn't yet got every write the primary
+    has to the given tables. The replica's versions are read in the session, so they belong
+    to the same snapshot as the data the request reads. Tables that were up to date are not
+    checked again in the same request.
+    """
+    session = db.session()
+    if not session.reads_from_replica():
+        return False
+    checked = session.info.setdefault("replica_checked", set())
+    names = set(names) - checked
+    if not names:
+        return False
+    with db.engine.connect() as connection:
+        primary = dict(connection.execute(versions_table.select()
+            .with_only_columns([versions_table.c.name, versions_table.c.version])
+            .where(versions_table.c.name.in_(names))).fetchall())
+    replica = dict(read_table_versions(names))
+    checked.update(names)
+    return any(version > replica.get(name, 0) for name, version in primary.items())
+
+
+def avoid_lagging_replica(names):
+    """
+    sends the request's reads to the primary if the replica doesn't yet have every write to the given
+    tables, so a stale replica never gives an old response under the versions after the write
+    """
+    if replica_lags(names):
+        db.session().read_from_primary()
+
+
+class VersionedCache(TTLCache):
+    """
+    TTLCache for data read from the given tables, shared by the threads of a worker process.
+    Every entry is stored with the table versions read before it was loaded and is only used
+    while they are unchanged, so a write committed by any process makes it stale. A commit in
+    this process makes the next lookup read table_version again.
+    @param models: the models the cached data is read from, every table if none are given
+    @param check_interval: seconds between reads of table_version, 0 reads it on every lookup
+    """
+
+    def __init__(self, *models, check_interval=0, **options):
+        super().__init__(**options)
+        self.names = sorted(table_name(model) for model in models) if models else None
+        self.check_interval = check_interval
+        self._checked = (0, None)
+        on_commit(lambda tables: self.recheck(), *models)
+
+    def recheck(self):
+        self._checked = (0, None)
+
+    def versions(self):
+        checked_at, versions = self._checked
+        now = time.time()
+        if versions is None or now - checked_at >= self.check_interval:
+            versions = read_table_versions(self.names)
+            self._checked = (now, versions)
+        return versions
+
+    def get_or_load(self, key, load, expires_at=None):
+        """
+        @param load: called without arguments when the entry is missing or stale, its result is cached
+        @param expires_at: unix timestamp after which the entry is dropped, defaults to now + ttl.
+            Can also be a function that gets the loaded value and returns the timestamp.
+        @returns value: the cached or loaded value
+        """
+        # Versionerna läses före datan, en skrivning mellan dem gör bara att posten läses om nästa gång
+        versions = self.versions()
+        entry = self.get(key)
+        if entry is not None:
+            if entry[0] == versions:
+                return entry[1]
+            # En inaktuell post räknas som en miss i statistiken
+            self.hits -= 1
+            self.misses += 1
+        value = load()
+        if callable(expires_at):
+            expires_at = expires_at(value)
+        self.set(key, (versions, value), expires_at)
+        return value
+
+
+def as_utc(value):
+    # Datum i modellerna är lokal tid utan tidszon, table_version sparas i UTC
+    return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+
+def conditional(*models, validators=()):
+    """
+    adds ETag and Last-Modified headers to a GET handler and answers 304 Not Modified
+    when the client already has the current version, before anything is serialized
+    @param models: the models the response is built from
+    @param validators: functions whose return values also change the response, e.g. the latest publication date
+    """
+    names = sorted(table_name(model) for model in models)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            avoid_lagging_replica(names)
+            rows = db.session.query(TableVersion.name, TableVersion.version, TableVersion.updated_at) \
+                .filter(TableVersion.name.in_(names)).order_by(TableVersion.name).all()
+
+            parts = [request.full_path] + ["%s:%d" % (name, version) for name, version, _ in rows]
+            last_modified = max((updated_at for _, _, updated_at in rows), default=None)
+            for validator in validators:
+                value = validator()
+                parts.append(str(value))
+                if isinstance(value, datetime):
+                    value = as_utc(value)
+                    last_modified = value if last_modified is None else max(last_modified, value)
+            etag = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+            if last_modified is not None:
+                last_modified = last_modified.replace(microsecond=0)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(etag)
+            else:
+                since = request.if_modified_since
+                not_modified = since is not None and last_modified is not None \
+                    and last_modified <= since.replace(tzinfo=None)
+
+            if not_modified:
+                response = make_response("", 304)
+            else:
+                response = f(*args, **kwargs)
+                if isinstance(response, dict):
+                    response = jsonify(response)
+                if not isinstance(response, Response) or response.status_code != 200:
+                    return response
+
+            response.set_etag(etag)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            return response
+
+        return decorated
+    return decorator
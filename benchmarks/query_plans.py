@@ -0,0 +1,153 @@
+"""
+Jämför frågeplaner och svarstider för de vanligaste filtren före och efter indexen i
+api/migrations/v003_query_indexes.py, på en syntetisk databas.
+
+    python benchmarks/query_plans.py --rows 20000
+
+Utan --database skapas en tillfällig SQLite-fil. Med --database postgresql://... körs
+samma sak mot Postgres, databasen ska då vara tom.
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--rows", type=int, default=20000, help="number of posts, events and page revisions")
+parser.add_argument("--repeat", type=int, default=20, help="runs per query when timing")
+parser.add_argument("--database", help="database URI, a temporary SQLite file by default")
+args = parser.parse_args()
+
+database = args.database or "sqlite:///" + os.path.join(tempfile.mkdtemp(), "benchmark.db")
+os.environ["SQLALCHEMY_DATABASE_URI"] = database
+
+from sqlalchemy import or_, tuple_, literal
+
+from api import app, migrations
+from api.db import db
+from api.models.committee import Committee, CommitteeCategory
+from api.models.committee_post import CommitteePost, CommitteePostTerm
+from api.models.document import Document, Tag, DocumentTags
+from api.models.event import Event, events_tags
+from api.models.page import Page, PageRevision
+from api.models.post import Post, posts_tags
+from api.models.post_tag import PostTag
+from api.models.user import User
+
+NOW = datetime(2021, 3, 1)
+
+
+def insert(model, rows):
+    table = getattr(model, "__table__", model)
+    for start in range(0, len(rows), 5000):
+        db.session.execute(table.insert(), rows[start:start + 5000])
+
+
+def generate(n):
+    random.seed(1)
+    day = lambda: NOW - timedelta(days=random.randint(-30, 3000), minutes=random.randint(0, 1440))
+    users = max(n // 10, 10)
+    posts = max(n // 40, 10)
+    pages = max(n // 100, 10)
+
+    insert(CommitteeCategory, [{"id": 1, "title": "Kategori", "weight": 1}])
+    insert(Page, [{"id": i, "slug": "sida-%d" % i} for i in range(1, pages + 1)])
+    insert(Committee, [{"id": i, "name": "Utskott %d" % i, "category_id": 1, "page_id": i, "version": 1} for i in range(1, pages + 1)])
+    insert(User, [{"id": i, "kth_id": "u%d" % i, "first_name": "Förnamn", "last_name": "Efternamn"} for i in range(1, users + 1)])
+    insert(CommitteePost, [{"id": i, "name": "Post %d" % i, "officials_email": "post%d@medieteknik.com" % i,
+        "committee_id": random.randint(1, pages), "is_official": i % 3 == 0, "weight": 1, "version": 1} for i in range(1, posts + 1)])
+    terms = []
+    for i in range(1, n // 4 + 1):
+        start = datetime(random.randint(2010, 2021), 7, 1)
+        terms.append({"id": i, "post_id": random.randint(1, posts), "user_id": random.randint(1, users),
+            "start_date": start, "end_date": start + timedelta(days=364)})
+    insert(CommitteePostTerm, terms)
+    insert(PostTag, [{"id": i, "title": "Tagg %d" % i} for i in range(1, 51)])
+    insert(Post, [{"id": i, "title": "Inlägg %d" % i, "body": "text", "user_id": random.randint(1, users),
+        "date": day(), "scheduled_date": day() if i % 4 == 0 else None, "draft": i % 10 == 0, "version": 1} for i in range(1, n + 1)])
+    insert(posts_tags, [{"post_id": i, "tag_id": random.randint(1, 50)} for i in range(1, n + 1) for _ in range(2)])
+    insert(Event, [{"id": i, "title": "Event %d" % i, "body": "text", "user_id": random.randint(1, users),
+        "committee_id": random.randint(1, pages), "date": day(), "event_date": day(), "end_date": day(),
+        "scheduled_date": day() if i % 4 == 0 else None, "draft": i % 10 == 0, "version": 1} for i in range(1, n + 1)])
+    insert(events_tags, [{"event_id": i, "tag_id": random.randint(1, 50)} for i in range(1, n + 1)])
+    insert(PageRevision, [{"id": i, "page_id": random.randint(1, pages), "author_id": random.randint(1, users),
+        "timestamp": day(), "published": i % 2 == 0, "title_sv": "Rubrik"} for i in range(1, n + 1)])
+    insert(Tag, [{"tagId": i, "title": "Dokumenttagg %d" % i} for i in range(1, 21)])
+    insert(Document, [{"itemId": i, "title": "Dokument %d" % i, "fileName": "%d.pdf" % i} for i in range(1, n // 4 + 1)])
+    insert(DocumentTags, [{"id": i, "itemId": i, "tagId": random.randint(1, 20)} for i in range(1, n // 4 + 1)])
+    db.session.commit()
+
+
+def hot_queries():
+    published = [Post.draft == False, or_(Post.scheduled_date <= NOW, Post.scheduled_date == None)]
+    cursor_values = db.session.query(Post.scheduled_date, Post.date, Post.id).filter(Post.scheduled_date != None) \
+        .order_by(Post.scheduled_date.desc()).offset(500).first()
+    return [
+        ("/posts", Post.query.filter(*published).order_by(Post.scheduled_date.desc(), Post.date.desc()).limit(20)),
+        ("/posts?cursor", Post.query.filter(*published).filter(Post.scheduled_date != None,
+            tuple_(Post.scheduled_date, Post.date, Post.id) < tuple_(*[literal(value, column.type) for value, column in
+                zip(cursor_values, (Post.scheduled_date, Post.date, Post.id))]))
+            .order_by(Post.scheduled_date.desc(), Post.date.desc(), Post.id.desc()).limit(21)),
+        ("/events", Event.query.filter(Event.draft == False, or_(Event.scheduled_date <= NOW, Event.scheduled_date == None)).limit(20)),
+        ("upcoming events", Event.query.filter(Event.event_date >= NOW).order_by(Event.event_date).limit(20)),
+        ("current terms of a post", CommitteePostTerm.query.filter(CommitteePostTerm.post_id == 7,
+            CommitteePostTerm.start_date <= NOW, CommitteePostTerm.end_date >= NOW)),
+        ("terms of a user", CommitteePostTerm.query.filter(CommitteePostTerm.user_id == 7)),
+        ("official by email", CommitteePost.query.filter(CommitteePost.officials_email == "post9@medieteknik.com")),
+        ("latest published revision", PageRevision.query.filter(PageRevision.page_id == 3, PageRevision.published == True)
+            .order_by(PageRevision.timestamp.desc()).limit(1)),
+        ("posts with a tag", db.session.query(posts_tags.c.post_id).filter(posts_tags.c.tag_id == 5)),
+        ("tags of a post", db.session.query(posts_tags.c.tag_id).filter(posts_tags.c.post_id == 5)),
+        ("events with a tag", db.session.query(events_tags.c.event_id).filter(events_tags.c.tag_id == 5)),
+        ("documents with a tag", Document.query.join(DocumentTags).filter(DocumentTags.tagId == 3)),
+    ]
+
+
+def explain(query):
+    statement = query.statement.compile(db.engine)
+    params = statement.construct_params()
+    connection = db.session.connection().connection
+    cursor = connection.cursor()
+    if db.engine.dialect.name == "sqlite":
+        cursor.execute("EXPLAIN QUERY PLAN " + str(statement), [params[name] for name in statement.positiontup])
+        return "; ".join(row[-1] for row in cursor.fetchall())
+    cursor.execute("EXPLAIN " + str(statement), params)
+    return "; ".join(row[0].strip() for row in cursor.fetchall())
+
+
+def measure(query):
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        query.all()
+        db.session.expunge_all()
+    return (time.perf_counter() - start) / args.repeat * 1000
+
+
+def report():
+    results = {}
+    for name, query in hot_queries():
+        results[name] = (explain(query), measure(query))
+    return results
+
+
+with app.app_context():
+    print("Databas:", database)
+    migrations.upgrade(db.engine)
+    migrations.downgrade(db.engine, "v002_version_columns")
+    generate(args.rows)
+    before = report()
+    migrations.upgrade(db.engine)
+    db.session.execute("ANALYZE")
+    after = report()
+
+    for name in before:
+        plan_before, time_before = before[name]
+        plan_after, time_after = after[name]
+        print("\n%s: %.2f ms -> %.2f ms" % (name, time_before, time_after))
+        print("  före:  " + plan_before)
+        print("  efter: " + plan_after)
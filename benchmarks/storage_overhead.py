@@ -0,0 +1,103 @@
+"""
+Mäter vad varje uppladdning kostar utöver själva filen: en ny storage.Client per anrop,
+som upload_blob gjorde tidigare, mot den gemensamma GCSStorage i api/utility/storage.py.
+Båda laddar upp mot en lokal ersättare för GCS:s JSON-API, så siffrorna visar klientens
+och anslutningarnas overhead utan nätverkslatens.
+
+    python benchmarks/storage_overhead.py --uploads 200
+
+Credential discovery och tokenhämtning mot Google ingår inte, ersättaren tar emot anonyma
+anrop. I produktion kostar de dessutom varje ny klient.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+parser.add_argument("--uploads", type=int, default=200, help="uploads per variant")
+parser.add_argument("--size", type=int, default=64 * 1024, help="bytes per upload")
+args = parser.parse_args()
+
+os.environ["STORAGE_BACKEND"] = "local"
+
+from google.auth.credentials import AnonymousCredentials
+from google.cloud import storage
+
+from api.utility.storage import GCSStorage
+
+
+class StandIn(BaseHTTPRequestHandler):
+    """
+    answers every request to the JSON API with an object resource, enough for
+    upload_from_string and make_public
+    """
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+    wbufsize = -1
+
+    def respond(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        resource = {"bucket": "benchmark", "name": "object", "generation": "1"}
+        if self.headers.get("Content-Type", "").startswith("application/json"):
+            resource.update(json.loads(body or b"{}"))
+        data = json.dumps(resource).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    do_GET = do_POST = do_PATCH = do_PUT = respond
+
+    def log_message(self, *args):
+        pass
+
+
+class CountingServer(ThreadingHTTPServer):
+    daemon_threads = True
+    connections = 0
+
+    def process_request(self, request, client_address):
+        self.connections += 1
+        super().process_request(request, client_address)
+
+
+def per_call_upload(endpoint, data, name):
+    client = storage.Client(project="benchmark", credentials=AnonymousCredentials(),
+        client_options={"api_endpoint": endpoint})
+    blob = client.bucket("benchmark").blob(name)
+    blob.upload_from_string(data, content_type="application/octet-stream")
+    blob.make_public()
+
+
+def run(label, upload, server):
+    data = os.urandom(args.size)
+    upload(data, "warmup")
+    connections = server.connections
+    start = time.perf_counter()
+    for i in range(args.uploads):
+        upload(data, "object-%d" % i)
+    elapsed = time.perf_counter() - start
+    print("%-22s %8.3f ms/upload %6d new connections" % (label, elapsed * 1000 / args.uploads, server.connections - connections))
+
+
+def main():
+    server = CountingServer(("127.0.0.1", 0), StandIn)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    endpoint = "http://127.0.0.1:%d" % server.server_address[1]
+
+    pooled = GCSStorage(client_options={"api_endpoint": endpoint}, credentials=AnonymousCredentials(), project="benchmark")
+    print("%d uploads of %d bytes against %s" % (args.uploads, args.size, endpoint))
+    run("new client per upload", lambda data, name: per_call_upload(endpoint, data, name), server)
+    run("GCSStorage", lambda data, name: pooled.upload_data("benchmark", data, "application/octet-stream", name), server)
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Testerna körs mot en egen SQLite-databas i en tillfällig mapp, där även svarscachen och
+jobbkön hamnar. Miljövariablerna sätts innan appen importeras.
+
+    python -m pytest
+"""
+import os
+import sys
+import tempfile
+
+directory = tempfile.mkdtemp(prefix="medieteknik-test-")
+os.environ["SQLALCHEMY_DATABASE_URI"] = "sqlite:///" + os.path.join(directory, "test.db")
+os.environ["RESPONSE_CACHE_PATH"] = os.path.join(directory, "response-cache.db")
+os.environ["JOB_QUEUE_PATH"] = os.path.join(directory, "jobs.db")
+os.environ["JOB_SPOOL_PATH"] = os.path.join(directory, "jobs")
+os.environ["STORAGE_BACKEND"] = "local"
+os.environ["SECRET_KEY"] = "test"
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from sqlalchemy import event
+
+from api import app as flask_app, migrations
+from api.db import db
+from api.utility import search_index
+
+
+@pytest.fixture(scope="session")
+def app():
+    """
+    the app with every table created, shared by all tests so each test creates its own rows
+    """
+    with flask_app.app_context():
+        db.create_all()
+        with db.engine.begin() as connection:
+            search_index.create(connection)
+        migrations.stamp(db.engine)
+    return flask_app
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        yield db.session
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def queries(app):
+    """
+    the SQL statements sent to the database while the test runs
+    """
+    statements = []
+
+    def count(connection, cursor, statement, *args):
+        statements.append(statement)
+
+    with app.app_context():
+        engine = db.engine
+    event.listen(engine, "before_cursor_execute", count)
+    yield statements
+    event.remove(engine, "before_cursor_execute", count)
@@ -0,0 +1,30 @@
+from api.db import db
+from api.utility.autocomplete import Autocomplete
+
+import threading
+import time
+
+
+def test_concurrent_lookups_build_the_index_once(app):
+    autocomplete = Autocomplete()
+    rebuild = autocomplete.rebuild
+
+    def slow_rebuild(session):
+        time.sleep(0.05)
+        rebuild(session)
+
+    autocomplete.rebuild = slow_rebuild
+    start = threading.Barrier(8)
+
+    def lookup():
+        with app.app_context():
+            start.wait()
+            autocomplete.complete(db.session, "a", 5)
+            db.session.remove()
+
+    threads = [threading.Thread(target=lookup) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert autocomplete.builds == 1
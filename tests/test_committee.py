@@ -0,0 +1,66 @@
+from api.models.committee import Committee, CommitteeCategory
+from api.models.committee_post import CommitteePost
+from api.models.event import Event
+from api.models.post_tag import PostTag
+from api.models.user import User
+
+from datetime import datetime, timedelta
+import time
+
+
+def create_committee(session, name, size):
+    """
+    a committee with size posts, each with a current official, and size events with a tag each
+    """
+    category = CommitteeCategory(title=name + " kategori")
+    committee = Committee(name=name, category=category)
+    now = datetime.now()
+    for i in range(size):
+        post = CommitteePost(name="%s post %d" % (name, i), committee=committee, is_official=True)
+        user = User(kth_id="%s-%d" % (name, i), first_name="Funktionär", last_name=str(i))
+        term = post.new_term(now - timedelta(days=30), now + timedelta(days=30))
+        term.user = user
+        session.add_all([post, user, term])
+        session.flush()
+        tag = PostTag(title="%s tagg %d" % (name, i))
+        session.add(Event(title="%s event %d" % (name, i), body="{}", committee=committee, tags=[tag], user_id=user.id))
+    session.add(committee)
+    session.commit()
+    return committee.id
+
+
+def test_committee_detail_query_count_is_constant(session, client, queries):
+    small = create_committee(session, "litet", 1)
+    large = create_committee(session, "stort", 12)
+
+    counts = []
+    for id, size in ((small, 1), (large, 12)):
+        del queries[:]
+        response = client.get("/committees/%d" % id)
+        assert response.status_code == 200
+        assert len(response.json["posts"]) == size
+        assert all(len(post["currentTerms"]) == 1 for post in response.json["posts"])
+        assert len(response.json["events"]) == size
+        counts.append(len(queries))
+
+    assert counts[0] == counts[1]
+
+
+def test_etag_changes_when_a_term_ends(session, client):
+    post = CommitteePost(name="avgående post", is_official=True,
+        committee=Committee(name="avgående", category=CommitteeCategory(title="avgående kategori")))
+    user = User(kth_id="avgaende", first_name="Avgående")
+    term = post.new_term(datetime.now() - timedelta(days=1), datetime.now() + timedelta(seconds=1))
+    term.user = user
+    session.add_all([post, user, term])
+    session.commit()
+
+    paths = ["/committees/%d" % post.committee_id, "/committee_posts/%d" % post.id]
+    etags = [client.get(path).headers["ETag"] for path in paths]
+    assert len(client.get(paths[1]).json["currentTerms"]) == 1
+    time.sleep(1.5)
+
+    # Inget har skrivits, men mandatperioden har tagit slut
+    for path, etag in zip(paths, etags):
+        assert client.get(path, headers={"If-None-Match": etag}).status_code == 200
+    assert client.get(paths[1]).json["currentTerms"] == []
@@ -0,0 +1,27 @@
+from api.models.document import Document
+from api.models.user import User
+from api.resources.authentication import issue_api_token
+from api.utility.jobs import job_queue
+
+import base64
+import os
+
+
+def test_malformed_upload_is_rejected_without_creating_a_document(session, client):
+    user = User(kth_id="dokument")
+    session.add(user)
+    session.commit()
+    headers = {"token": issue_api_token(user)}
+    spooled = set(os.listdir(job_queue.spool_path)) if os.path.isdir(job_queue.spool_path) else set()
+
+    documents = Document.query.count()
+    for file in ("ingen data-url", "data:application/pdf;base64,inte%base64"):
+        response = client.post("/documents", json={"title": {"se": "trasig"}, "file": file}, headers=headers)
+        assert response.status_code == 400
+    assert Document.query.count() == documents
+    assert set(os.listdir(job_queue.spool_path)) - spooled == set()
+
+    file = "data:application/pdf;base64," + base64.b64encode(b"%PDF-1.4").decode()
+    response = client.post("/documents", json={"title": {"se": "hel"}, "file": file}, headers=headers)
+    assert response.status_code == 202
+    assert Document.query.count() == documents + 1
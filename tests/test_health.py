@@ -0,0 +1,12 @@
+from api.resources import health
+
+
+def test_health_answers_ok(client):
+    assert client.get("/health").json == "ok"
+
+
+def test_health_shows_the_pool_when_enabled(client, monkeypatch):
+    monkeypatch.setattr(health, "POOL_STATS", True)
+    response = client.get("/health").json
+    assert response["status"] == "ok"
+    assert "class" in response["databasePool"]
@@ -0,0 +1,16 @@
+from api.models.user import User
+from api.resources.authentication import issue_api_token
+from api.utility.jobs import job_queue
+
+
+def test_job_status_is_only_shown_to_its_user_and_admins(session, client):
+    owner = User(kth_id="jobbagare")
+    other = User(kth_id="annan")
+    admin = User(kth_id="admin", is_admin=True)
+    session.add_all([owner, other, admin])
+    session.commit()
+
+    id = job_queue.enqueue("tests.job", user_id=owner.id)
+    statuses = [client.get("/jobs/" + id, headers={"token": issue_api_token(user)}).status_code
+        for user in (owner, other, admin)]
+    assert statuses == [200, 404, 200]
@@ -0,0 +1,38 @@
+from datetime import datetime
+
+from sqlalchemy import create_engine
+
+from api import migrations
+from api.db import db
+from api.migrations import v002_version_columns, v006_image_derivatives
+from api.utility import search_index
+
+
+def baseline_engine(path):
+    """
+    a database shaped like one created before the migrations: the tables from the models
+    without the columns and the search index that the later migrations add
+    """
+    engine = create_engine("sqlite:///" + str(path))
+    db.metadata.create_all(engine)
+    columns = [(table, "version") for table in v002_version_columns.VERSIONED_TABLES] + v006_image_derivatives.COLUMNS
+    with engine.begin() as connection:
+        for table, column in columns:
+            connection.execute('ALTER TABLE "%s" DROP COLUMN "%s"' % (table, column))
+        connection.execute("INSERT INTO user (kth_id, first_name, last_name) VALUES ('migrerad', 'Migrerade', 'Medlemmen')")
+    return engine
+
+
+def test_all_migrations_apply_to_a_baseline_database(tmp_path):
+    engine = baseline_engine(tmp_path / "baseline.db")
+
+    applied = migrations.upgrade(engine)
+    assert applied == [name for name, _ in migrations.migrations()]
+    assert migrations.upgrade(engine) == []
+
+    with engine.connect() as connection:
+        for table, column in v006_image_derivatives.COLUMNS:
+            assert migrations.has_column(connection, table, column)
+        assert search_index.is_available(connection)
+        rows = search_index.backend(connection).search(connection, ["migrerade"], datetime.now(), 10, 0)
+        assert [kind for kind, _, _ in rows] == ["user"]
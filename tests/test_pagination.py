@@ -0,0 +1,31 @@
+from api.models.post import Post
+from api.models.user import User
+from api.utility.pagination import counts
+
+from datetime import datetime, timedelta
+
+
+def published_posts(session):
+    return Post.query.filter(Post.draft == False, (Post.scheduled_date <= datetime.now()) | (Post.scheduled_date == None)).count()
+
+
+def test_post_count_is_reused_between_requests_and_updated_on_write(session, client):
+    user = User(kth_id="pagination", first_name="Sida")
+    session.add(user)
+    session.flush()
+    session.add_all([
+        Post(title="publicerat", body="{}", user_id=user.id),
+        Post(title="schemalagt", body="{}", user_id=user.id, scheduled_date=datetime.now() - timedelta(days=1)),
+        Post(title="senare", body="{}", user_id=user.id, scheduled_date=datetime.now() + timedelta(days=1)),
+    ])
+    session.commit()
+
+    # Argumentet n gör att svarscachen inte svarar, så varje anrop räknar på nytt
+    hits = counts.hits
+    totals = [client.get("/posts?perPage=1&n=%d" % n).json["totalCount"] for n in range(3)]
+    assert totals == [published_posts(session)] * 3
+    assert counts.hits - hits == 2
+
+    session.add(Post(title="nytt", body="{}", user_id=user.id))
+    session.commit()
+    assert client.get("/posts?perPage=1&n=3").json["totalCount"] == totals[0] + 1
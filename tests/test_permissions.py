@@ -0,0 +1,20 @@
+from api.models.event import Event
+from api.models.post import Post
+from api.models.user import User
+from api.resources.authentication import issue_api_token
+
+
+def test_posts_and_events_can_only_be_deleted_by_their_author_or_an_admin(session, client):
+    author = User(kth_id="forfattare")
+    other = User(kth_id="obehorig")
+    admin = User(kth_id="administrator", is_admin=True)
+    session.add_all([author, other, admin])
+    session.flush()
+    post = Post(title="radera", body="{}", user_id=author.id)
+    event = Event(title="radera", body="{}", user_id=author.id)
+    session.add_all([post, event])
+    session.commit()
+
+    for path in ("/posts/%d" % post.id, "/events/%d" % event.id):
+        assert client.delete(path, headers={"token": issue_api_token(other)}).status_code == 401
+        assert client.delete(path, headers={"token": issue_api_token(admin)}).status_code == 200
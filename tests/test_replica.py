@@ -0,0 +1,110 @@
+"""
+Repliken är en kopia av testdatabasen i en egen SQLite-fil, som bara ändras när testet synkar den
+"""
+from api.db import db, reads_from_replica
+from api.models.document import Tag
+from api.models.user import User
+from api.resources.authentication import issue_api_token
+
+import os
+import sqlite3
+import pytest
+
+
+def primary_path():
+    return os.environ["SQLALCHEMY_DATABASE_URI"][len("sqlite:///"):]
+
+
+def set_title(path, id, title):
+    connection = sqlite3.connect(path)
+    with connection:
+        connection.execute('UPDATE tags SET title = ? WHERE "tagId" = ?', (title, id))
+    connection.close()
+
+
+@pytest.fixture
+def replica(app, monkeypatch):
+    path = os.path.join(os.path.dirname(primary_path()), "replica.db")
+
+    def sync():
+        source, target = sqlite3.connect(primary_path()), sqlite3.connect(path)
+        source.backup(target)
+        source.close()
+        target.close()
+
+    sync()
+    monkeypatch.setitem(app.config, "SQLALCHEMY_BINDS", {"replica": "sqlite:///" + path})
+    yield path, sync
+    with app.app_context():
+        db.get_engine(app, bind="replica").dispose()
+
+
+@pytest.fixture
+def tag(session):
+    tag = Tag(title="primär")
+    session.add(tag)
+    session.commit()
+    id = tag.tagId
+    # Som i ett nytt anrop, sessionen har inte skrivit något
+    session.remove()
+    return id
+
+
+def title(client, id, **kwargs):
+    return client.get("/document_tags/%d" % id, **kwargs).json["title"]["se"]
+
+
+def test_anonymous_reads_go_to_the_replica(session, client, tag, replica):
+    path, sync = replica
+    user = User(kth_id="replikaanvandare")
+    session.add(user)
+    session.commit()
+    token = issue_api_token(user)
+    session.remove()
+    sync()
+    # Raden ändras bara i repliken, utan ny version, så svaret visar vilken databas som lästes
+    set_title(path, tag, "replika")
+
+    assert title(client, tag) == "replika"
+    assert title(client, tag, headers={"token": token}) == "primär"
+
+
+def test_reads_after_a_write_in_the_same_request_go_to_the_primary(app, session, tag, replica):
+    path, sync = replica
+    other = Tag(title="primär")
+    session.add(other)
+    session.commit()
+    other = other.tagId
+    session.remove()
+    sync()
+    set_title(path, other, "replika")
+
+    def read(id):
+        return db.session.execute('SELECT title FROM tags WHERE "tagId" = :id', {"id": id}).scalar()
+
+    @reads_from_replica
+    def handler():
+        before = read(other)
+        Tag.query.get(tag).title = "ändrad"
+        db.session.flush()
+        after = read(other)
+        db.session.rollback()
+        return before, after
+
+    with app.test_request_context("/"):
+        assert handler() == ("replika", "primär")
+        db.session.remove()
+
+
+def test_a_lagging_replica_sends_the_reads_to_the_primary(session, client, tag, replica):
+    path, sync = replica
+    sync()
+    Tag.query.get(tag).title = "ny"
+    session.commit()
+    session.remove()
+
+    # Repliken har inte fått skrivningen, dess table_version ligger efter
+    assert title(client, tag) == "ny"
+    sync()
+    set_title(path, tag, "replika")
+    assert title(client, tag) == "replika"
@@ -0,0 +1,23 @@
+from api.models.user import User
+from api.utility import search_index
+
+
+def test_commit_is_indexed_when_the_process_has_not_seen_the_index(session, client):
+    # En ny process vet inte om indexet finns och kontrollerar det vid första skrivningen
+    search_index._available.clear()
+    session.add(User(kth_id="sokbar", first_name="Sökbara", last_name="Svensson"))
+    session.commit()
+
+    results = client.get("/search/Sökbara").json["data"]
+    assert [result["kthId"] for result in results if result["type"] == "user"] == ["sokbar"]
+
+
+def test_only_the_last_word_is_matched_as_a_prefix(session, client):
+    session.add(User(kth_id="prefix", first_name="Prefixa", last_name="Persson"))
+    session.commit()
+
+    def found(text):
+        return [result["kthId"] for result in client.get("/search/" + text).json["data"] if result["type"] == "user"]
+
+    assert found("Persson Prefi") == ["prefix"]
+    assert found("Prefi Persson") == []
@@ -0,0 +1,20 @@
+from api.db import db
+from api.utility.versions import bump_table_versions, insert_ignore, versions_table
+
+from datetime import datetime
+
+
+def version(connection, name):
+    return connection.execute(versions_table.select()
+        .with_only_columns([versions_table.c.version]).where(versions_table.c.name == name)).scalar()
+
+
+def test_first_write_to_a_table_creates_its_version_row_once(app):
+    with app.app_context(), db.engine.begin() as connection:
+        bump_table_versions(connection, ["ny_tabell"])
+        assert version(connection, "ny_tabell") == 1
+
+        # Som om en annan transaktion hann skapa raden först
+        connection.execute(insert_ignore(connection), [{"name": "ny_tabell", "version": 0, "updated_at": datetime.utcnow()}])
+        bump_table_versions(connection, ["ny_tabell"])
+        assert version(connection, "ny_tabell") == 2